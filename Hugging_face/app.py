@@ -1,8 +1,10 @@
 import os
 import tempfile
-from flask import Flask, render_template, request, jsonify, session
+import uuid
+from flask import Flask, Response, render_template, request, jsonify, session
 from werkzeug.utils import secure_filename
-import rag_module as rag
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from qa_engine import QAEngine
 
 app = Flask(__name__)
 app.secret_key = "ai_recruitment_platform_secret_key"  # For session management
@@ -16,22 +18,20 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 # Initialize global variables to store in session
 @app.before_request
 def initialize_session():
+    if 'session_id' not in session:
+        session['session_id'] = uuid.uuid4().hex
     if 'pdf_path' not in session:
         session['pdf_path'] = None
     if 'qa_initialized' not in session:
         session['qa_initialized'] = False
 
 
-# Function to get QA chain (using global variables to maintain state)
-qa_chains = {}
+# Session-scoped QA chains, bounded by entries and memory; evicted sessions lose their upload
+qa_engine = QAEngine()
 
 
-def get_qa_chain(pdf_path):
-    # Use a simple caching mechanism
-    if pdf_path not in qa_chains:
-        vector = rag.load_or_create_embeddings(pdf_path)
-        qa_chains[pdf_path] = rag.setup_qa_chain(vector)
-    return qa_chains[pdf_path]
+def has_resume():
+    return session.get('qa_initialized') and qa_engine.has_session(session['session_id'])
 
 
 # Routes
@@ -52,8 +52,10 @@ def upload_file():
 
     if file and file.filename.lower().endswith('.pdf'):
         filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        # Prefix with the session so equal file names from different sessions don't collide
+        file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{session['session_id']}_{filename}")
         file.save(file_path)
+        qa_engine.register(session['session_id'], file_path)
 
         # Store the file path in session
         session['pdf_path'] = file_path
@@ -70,7 +72,7 @@ def upload_file():
 
 @app.route('/analyze', methods=['POST'])
 def analyze_resume():
-    if not session.get('qa_initialized') or not session.get('pdf_path'):
+    if not has_resume():
         return jsonify({'error': 'Please upload a resume first'}), 400
 
     data = request.json
@@ -79,12 +81,9 @@ def analyze_resume():
     if not question:
         return jsonify({'error': 'Question is required'}), 400
 
-    # Get the QA chain for the uploaded PDF
-    qa_chain = get_qa_chain(session['pdf_path'])
-
     # Perform the question answering
     try:
-        result = rag.ask_question(qa_chain, question, return_text=True)
+        result = qa_engine.ask(session['session_id'], question)
 
         # Extract source information
         sources = []
@@ -109,7 +108,7 @@ def analyze_resume():
 
 @app.route('/job-match', methods=['POST'])
 def job_match():
-    if not session.get('qa_initialized') or not session.get('pdf_path'):
+    if not has_resume():
         return jsonify({'error': 'Please upload a resume first'}), 400
 
     data = request.json
@@ -118,15 +117,12 @@ def job_match():
     if not job_description:
         return jsonify({'error': 'Job description is required'}), 400
 
-    # Get the QA chain for the uploaded PDF
-    qa_chain = get_qa_chain(session['pdf_path'])
-
     # Create a matching question
     question = f"Based on the following job description, evaluate how well the candidate's skills and experience match. Provide a match percentage and brief explanation. Job description: {job_description}"
 
     # Perform the question answering
     try:
-        result = rag.ask_question(qa_chain, question, return_text=True)
+        result = qa_engine.ask(session['session_id'], question)
 
         return jsonify({
             'success': True,
@@ -138,17 +134,18 @@ def job_match():
 
 @app.route('/clear', methods=['POST'])
 def clear_session():
-    # Clear the current session
+    # Clear the current session and drop its QA chain and uploaded file
+    if 'session_id' in session:
+        qa_engine.evict(session['session_id'])
     session.clear()
     initialize_session()
     return jsonify({'success': True})
 
 
-if __name__ == '__main__':
-    # Modify the rag module to return text instead of printing
-    rag.ask_question = lambda qa_chain, question, return_text=False: {
-        "answer": qa_chain(question)['result'],
-        "source_documents": qa_chain(question).get('source_documents', [])
-    }
+@app.route('/metrics')
+def metrics():
+    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
 
+
+if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
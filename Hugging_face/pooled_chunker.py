@@ -0,0 +1,74 @@
+import re
+import numpy as np
+from langchain_core.documents import Document
+from langchain_experimental.text_splitter import SemanticChunker
+
+
+def _pool(vectors):
+    """Mean of sentence vectors, rescaled to their average norm"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    pooled = vectors.mean(axis=0)
+    norm = np.linalg.norm(pooled)
+    if norm == 0:
+        return pooled.tolist()
+    return (pooled * (np.linalg.norm(vectors, axis=1).mean() / norm)).tolist()
+
+
+class PooledSemanticChunker(SemanticChunker):
+    """SemanticChunker that also returns a vector for every chunk.
+
+    The sentence windows SemanticChunker embeds to find breakpoints are
+    mean-pooled into chunk vectors, so a FAISS index can be built from
+    them without embedding the chunks a second time. Chunks with no
+    sentence vectors (single-sentence pages) are embedded in one batch.
+    """
+
+    def split_text_with_vectors(self, text):
+        """Return [(chunk, vector or None)] with the same chunks as split_text"""
+        single_sentences_list = re.split(self.sentence_split_regex, text)
+        if len(single_sentences_list) == 1:
+            return [(single_sentences_list[0], None)]
+        if self.breakpoint_threshold_type == "gradient" and len(single_sentences_list) == 2:
+            return [(sentence, None) for sentence in single_sentences_list]
+
+        distances, sentences = self._calculate_sentence_distances(single_sentences_list)
+        if self.number_of_chunks is not None:
+            threshold = self._threshold_from_clusters(distances)
+            breakpoint_array = distances
+        else:
+            threshold, breakpoint_array = self._calculate_breakpoint_threshold(distances)
+
+        groups = []
+        start_index = 0
+        for index, distance in enumerate(breakpoint_array):
+            if distance <= threshold:
+                continue
+            group = sentences[start_index:index + 1]
+            if self.min_chunk_size is not None and len(" ".join(d["sentence"] for d in group)) < self.min_chunk_size:
+                continue
+            groups.append(group)
+            start_index = index + 1
+        if start_index < len(sentences):
+            groups.append(sentences[start_index:])
+
+        return [
+            (" ".join(d["sentence"] for d in group), _pool([d["combined_sentence_embedding"] for d in group]))
+            for group in groups
+        ]
+
+    def split_text(self, text):
+        return [chunk for chunk, _ in self.split_text_with_vectors(text)]
+
+    def split_documents_with_vectors(self, documents):
+        """Split documents like split_documents; returns (chunks, vectors)"""
+        chunks, vectors = [], []
+        for document in documents:
+            for chunk, vector in self.split_text_with_vectors(document.page_content):
+                chunks.append(Document(page_content=chunk, metadata=dict(document.metadata)))
+                vectors.append(vector)
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            for i, vector in zip(missing, self.embeddings.embed_documents([chunks[i].page_content for i in missing])):
+                vectors[i] = vector
+        return chunks, vectors
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from prometheus_client import Gauge
+import rag_module as rag
+
+# Cache limits, overridable through the environment
+QA_CACHE_MAX_ENTRIES = int(os.environ.get('QA_CACHE_MAX_ENTRIES', 32))
+QA_CACHE_MAX_BYTES = int(os.environ.get('QA_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+QA_CACHE_TTL_SECONDS = float(os.environ.get('QA_CACHE_TTL_SECONDS', 60 * 60))
+
+QA_CACHE_ENTRIES = Gauge('resume_analyzer_qa_cache_entries', 'Sessions with an uploaded resume in the QA cache')
+QA_CACHE_BYTES = Gauge('resume_analyzer_qa_cache_bytes', 'Approximate memory held by cached QA chains')
+
+
+def _approximate_size(vector):
+    """Bytes held by a FAISS store: float32 vectors plus chunk text"""
+    size = vector.index.ntotal * vector.index.d * 4
+    for doc_id in vector.index_to_docstore_id.values():
+        size += len(vector.docstore.search(doc_id).page_content)
+    return size
+
+
+class _Session:
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        self.qa_chain = None
+        self.size = 0
+        self.last_used = time.time()
+        self.lock = threading.Lock()
+
+
+class QAEngine:
+    """Per-session QA chains with least-recently-used and idle-time eviction.
+
+    A session is registered when its resume is uploaded and its chain is
+    built on the first question. Evicting a session (LRU beyond the entry
+    or byte limit, idle past the TTL, or cleared) drops the chain and
+    deletes the uploaded file and its embeddings.
+    """
+
+    def __init__(self, max_entries=QA_CACHE_MAX_ENTRIES, max_bytes=QA_CACHE_MAX_BYTES, ttl=QA_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, session_id, pdf_path):
+        """Attach an uploaded resume to a session, replacing any previous one"""
+        with self._lock:
+            previous = self._sessions.pop(session_id, None)
+            self._sessions[session_id] = _Session(pdf_path)
+        if previous is not None and previous.pdf_path != pdf_path:
+            self._remove_file(previous)
+        # A re-upload under the same name overwrites the file in place, and embeddings
+        # pickled for earlier content (also before a restart) would be loaded for it
+        self._remove_paths(rag.embeddings_cache_path(pdf_path))
+        self._enforce_limits()
+
+    def has_session(self, session_id):
+        with self._lock:
+            return session_id in self._sessions
+
+    def ask(self, session_id, question):
+        """Run the session's QA chain once and return the answer and source documents"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                raise KeyError(session_id)
+            self._sessions.move_to_end(session_id)
+            entry.last_used = time.time()
+
+        with entry.lock:
+            if entry.qa_chain is None:
+                vector = rag.load_or_create_embeddings(entry.pdf_path)
+                entry.qa_chain = rag.setup_qa_chain(vector)
+                entry.size = _approximate_size(vector)
+        self._enforce_limits()
+
+        result = entry.qa_chain(question)
+        return {
+            'answer': result['result'],
+            'source_documents': result.get('source_documents', [])
+        }
+
+    def evict(self, session_id):
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is not None:
+            self._remove_file(entry)
+        self._update_metrics()
+
+    def _remove_file(self, entry):
+        # The upload and the embeddings pickled for it
+        self._remove_paths(entry.pdf_path, rag.embeddings_cache_path(entry.pdf_path))
+
+    def _remove_paths(self, *paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _enforce_limits(self):
+        evicted = []
+        with self._lock:
+            now = time.time()
+            for session_id, entry in list(self._sessions.items()):
+                if now - entry.last_used > self.ttl:
+                    evicted.append(self._sessions.pop(session_id))
+
+            total = sum(entry.size for entry in self._sessions.values())
+            # Keep the most recently used session even if it alone exceeds the byte limit
+            while len(self._sessions) > 1 and (len(self._sessions) > self.max_entries or total > self.max_bytes):
+                _, entry = self._sessions.popitem(last=False)
+                total -= entry.size
+                evicted.append(entry)
+
+        for entry in evicted:
+            self._remove_file(entry)
+        self._update_metrics()
+
+    def _update_metrics(self):
+        with self._lock:
+            QA_CACHE_ENTRIES.set(len(self._sessions))
+            QA_CACHE_BYTES.set(sum(entry.size for entry in self._sessions.values()))
@@ -1,12 +1,11 @@
 import os
+import sys
 import pickle
+import uuid
 import warnings
 from rich.console import Console
 from rich.prompt import Prompt
 from rich import print as rprint
-from langchain_community.document_loaders import PDFPlumberLoader
-from langchain_experimental.text_splitter import SemanticChunker
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain_community.llms import Ollama
 from langchain.prompts import PromptTemplate
@@ -15,11 +14,29 @@ from langchain.chains.llm import LLMChain
 from langchain.chains.combine_documents.stuff import StuffDocumentsChain
 from ollama import chat
 
+# Share the parallel, cached PDF extraction stage with the main app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_extraction import extract_documents
+from embedding_backends import BackendEmbeddings, backend_settings
+from pooled_chunker import PooledSemanticChunker
+
 warnings.filterwarnings("ignore")
 console = Console()
 
+# HuggingFaceEmbeddings' default model; EMBEDDING_BACKEND selects torch or ONNX Runtime
+EMBEDDING_MODEL_NAME = os.environ.get('HF_EMBEDDING_MODEL', 'sentence-transformers/all-mpnet-base-v2')
+
+def embeddings_cache_path(pdf_path):
+    settings = backend_settings()
+    if settings['backend'] == 'torch':
+        return f"embeddings_{os.path.basename(pdf_path)}.pkl"
+    # Vectors from other backends are cached separately
+    suffix = '_'.join(value for value in settings.values() if value)
+    return f"embeddings_{os.path.basename(pdf_path)}.{suffix}.pkl"
+
+
 def load_or_create_embeddings(pdf_path):
-    embeddings_path = f"embeddings_{os.path.basename(pdf_path)}.pkl"
+    embeddings_path = embeddings_cache_path(pdf_path)
     if os.path.exists(embeddings_path):
         console.print(f"[green]Loading existing embeddings from {embeddings_path}...[/green]")
         with open(embeddings_path, 'rb') as f:
@@ -28,19 +45,30 @@ def load_or_create_embeddings(pdf_path):
     console.print(f"[yellow]Creating new embeddings for {pdf_path}...[/yellow]")
 
     with console.status("[bold green]Loading PDF..."):
-        loader = PDFPlumberLoader(pdf_path)
-        docs = loader.load()
+        docs = extract_documents(pdf_path)
 
     with console.status("[bold green]Splitting document into chunks..."):
-        embedder = HuggingFaceEmbeddings()
-        text_splitter = SemanticChunker(embedder)
-        documents = text_splitter.split_documents(docs)
+        embedder = BackendEmbeddings(EMBEDDING_MODEL_NAME)
+        text_splitter = PooledSemanticChunker(embedder)
+        documents, vectors = text_splitter.split_documents_with_vectors(docs)
 
     with console.status("[bold green]Creating vector embeddings..."):
-        vector = FAISS.from_documents(documents, embedder)
+        # Chunk vectors are pooled from the sentence embeddings the chunker already computed
+        vector = FAISS.from_embeddings(
+            [(doc.page_content, embedding) for doc, embedding in zip(documents, vectors)],
+            embedder,
+            metadatas=[doc.metadata for doc in documents]
+        )
 
-    with open(embeddings_path, 'wb') as f:
-        pickle.dump(vector, f)
+    # Written under a temporary name and renamed, so another run never loads a partial pickle
+    tmp_path = f"{embeddings_path}.tmp-{uuid.uuid4().hex}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(vector, f)
+        os.replace(tmp_path, embeddings_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
     console.print(f"[green]Embeddings saved to {embeddings_path}[/green]")
     return vector
@@ -1,96 +1,256 @@
-from flask import Flask, request, render_template, jsonify, session
+from flask import Flask, request, render_template, jsonify, session, Response, url_for
 import os
 from werkzeug.utils import secure_filename
-import uuid
-from rag import query_pdf
-import re
+import json
+from resume_pipeline import ResumeAnalysisPipeline, ANALYSIS_MODES
+from job_queue import JobQueue, QueueFull, SUCCESS, ERROR
+from llm_cache import create_response_cache
+from llm_gateway import get_llm_gateway, GatewayBusy, INTERACTIVE
+from candidate_ranking import rank_candidates, RANKING_TOP_K
+from candidate_index import get_candidate_index
+from embedding_store import hash_file
+from uploads import UploadRequest, read_upload
+from embedding_engine import get_embedding_engine
+from tracing import trace, start_trace, end_trace, current_trace_id
+from warmup import WarmUp, WARMUP_ON_START, warmup_models
+from model_router import get_model_router
 import time
-import random
 import threading
 import psutil
-from ollama import Client
-from prometheus_client import Counter, Histogram, Gauge, Summary, generate_latest, REGISTRY, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Histogram, Gauge, Summary, generate_latest, REGISTRY, CONTENT_TYPE_LATEST, CollectorRegistry, multiprocess
+
+# When this process started, for the startup and time-to-first-request gauges
+PROCESS_START_TIME = psutil.Process().create_time()
 
 app = Flask(__name__)
 app.secret_key = 'resume_analyzer_secret_key'
+# Uploaded files are hashed as they stream in and kept in memory (see uploads.py)
+app.request_class = UploadRequest
 
-# Configure upload folder
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf'}
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
-# Configure Ollama client with the host from environment variable
-OLLAMA_HOST = os.environ.get('OLLAMA_HOST')
-ollama_client = Client(host=OLLAMA_HOST)
+# All Ollama calls go through the shared gateway (host and limits are set in llm_gateway.py)
+llm_gateway = get_llm_gateway()
+
+# Picks the model for each LLM task by latency and queue depth (routes are set in model_router.py)
+model_router = get_model_router()
+
+# Cache of generated job plans and interview questions (see llm_cache.py for settings)
+response_cache = create_response_cache()
+
+# Clients seen within this many seconds count as active users
+ACTIVE_USER_WINDOW_SECONDS = float(os.environ.get('ACTIVE_USER_WINDOW_SECONDS', 300))
 
-# Create upload directory if it doesn't exist
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+# Background analysis job settings
+JOB_DB_PATH = os.environ.get('JOB_DB_PATH', 'jobs.db')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 100))
+# Idle job workers check for jobs queued by other server processes this often
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', 1))
+# gunicorn.conf.py requeues interrupted jobs once in the master and turns this off for the workers
+JOB_RECOVER_ON_START = os.environ.get('JOB_RECOVER_ON_START', '1').strip().lower() in ('1', 'true', 'yes', 'on')
+# Finished jobs and their results are deleted this many seconds after they finish; 0 keeps them
+JOB_RETENTION_SECONDS = float(os.environ.get('JOB_RETENTION_SECONDS', 7 * 24 * 60 * 60))
 
 # Initialize Prometheus metrics
 REQUESTS = Counter('resume_analyzer_requests_total', 'Total HTTP requests', ['method', 'endpoint', 'status'])
 REQUEST_TIME = Histogram('resume_analyzer_request_duration_seconds', 'Request duration in seconds', ['method', 'endpoint'])
-LLM_REQUEST_TIME = Histogram('resume_analyzer_llm_request_duration_seconds', 'LLM request duration in seconds', ['model', 'request_type'])
+JOB_QUEUE_DEPTH = Gauge('resume_analyzer_job_queue_depth', 'Number of analysis jobs waiting for a worker', multiprocess_mode='max')
+JOB_WAIT_TIME = Histogram('resume_analyzer_job_wait_seconds', 'Time analysis jobs wait in the queue before starting', buckets=[0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300])
+JOB_RUN_TIME = Histogram('resume_analyzer_job_run_seconds', 'Time spent running analysis jobs', buckets=[1, 2.5, 5, 10, 20, 30, 60, 120, 300])
+LLM_TIME_TO_FIRST_TOKEN = Histogram('resume_analyzer_llm_time_to_first_token_seconds', 'Time from sending a streaming LLM request to its first token', ['model', 'request_type'], buckets=[0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30])
 RESUME_COUNT = Counter('resume_analyzer_resumes_processed_total', 'Total resumes processed')
 JOB_MATCH_SCORE = Histogram('resume_analyzer_job_match_scores', 'Job match scores', buckets=[10, 20, 30, 40, 50, 60, 70, 80, 90, 100])
-ACTIVE_USERS = Gauge('resume_analyzer_active_users', 'Number of active users')
-SYSTEM_MEMORY = Gauge('resume_analyzer_memory_usage_bytes', 'Memory usage in bytes')
-CPU_USAGE = Gauge('resume_analyzer_cpu_usage_percent', 'CPU usage percentage')
-LLM_TOKEN_USAGE = Counter('resume_analyzer_llm_tokens_total', 'Total tokens used by LLM', ['model', 'operation'])
+ACTIVE_USERS = Gauge('resume_analyzer_active_users', 'Distinct clients with a request in the last ACTIVE_USER_WINDOW_SECONDS', multiprocess_mode='max')
+IN_FLIGHT_REQUESTS = Gauge('resume_analyzer_requests_in_flight', 'HTTP requests currently being handled', multiprocess_mode='livesum')
+SYSTEM_MEMORY = Gauge('resume_analyzer_memory_usage_bytes', 'Memory usage in bytes', multiprocess_mode='max')
+CPU_USAGE = Gauge('resume_analyzer_cpu_usage_percent', 'CPU usage percentage', multiprocess_mode='max')
 ENDPOINTS_USAGE = Counter('resume_analyzer_endpoints_usage_total', 'Endpoints usage count', ['endpoint'])
+STARTUP_TIME = Gauge('resume_analyzer_startup_seconds', 'Seconds from process start until the app could serve requests', multiprocess_mode='liveall')
+FIRST_REQUEST_TIME = Gauge('resume_analyzer_time_to_first_request_seconds', 'Seconds from process start until the first request was received', multiprocess_mode='liveall')
+FIRST_ANALYSIS_TIME = Gauge('resume_analyzer_first_analysis_seconds', 'Seconds from submitting the first resume analysis of this process to its result', multiprocess_mode='liveall')
+
+# Last request time per client, for the active user gauge
+client_last_seen = {}
+client_last_seen_lock = threading.Lock()
+
+def update_active_users():
+    cutoff = time.time() - ACTIVE_USER_WINDOW_SECONDS
+    with client_last_seen_lock:
+        for client in [client for client, seen in client_last_seen.items() if seen < cutoff]:
+            del client_last_seen[client]
+        ACTIVE_USERS.set(len(client_last_seen))
 
 # Function to update system metrics
 def update_system_metrics():
     SYSTEM_MEMORY.set(psutil.virtual_memory().used)
     CPU_USAGE.set(psutil.cpu_percent())
+    update_active_users()
 
-# Simulated metrics for demonstration
-def simulate_user_metrics():
-    """Generate simulated metrics for the dashboard"""
+def poll_system_metrics():
+    """Refresh the system and active user gauges between scrapes"""
     while True:
-        # Simulate active users (5-50)
-        ACTIVE_USERS.set(random.randint(5, 50))
-        
-        # Update real system metrics
         update_system_metrics()
-        
-        # Wait before updating again
         time.sleep(5)
 
-# Start the simulation thread
+# Start the metrics thread
 try:
-    simulation_thread = threading.Thread(target=simulate_user_metrics, daemon=True)
-    simulation_thread.start()
+    metrics_thread = threading.Thread(target=poll_system_metrics, daemon=True)
+    metrics_thread.start()
 except Exception as e:
     print(f"Failed to start metrics thread: {str(e)}")
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+first_analysis_done = False
+
+def run_analysis_job(job, report_progress):
+    """Analyse an uploaded resume in a job worker"""
+    global first_analysis_done
+    payload = job['payload']
+    try:
+        with trace(payload.get('trace_id')):
+            summary = analyze_upload(payload, report_progress)
+        if not first_analysis_done:
+            first_analysis_done = True
+            FIRST_ANALYSIS_TIME.set(time.time() - job['created_at'])
+        return summary
+    finally:
+        # The upload saved for this job; a job interrupted by a restart keeps it until it runs again
+        if payload.get('filepath'):
+            try:
+                os.remove(payload['filepath'])
+            except OSError:
+                pass
+
+def analyze_upload(payload, report_progress):
+    """Summarise an uploaded resume and add it to the candidate index"""
+    # The page text is parsed from the saved upload here unless it is already cached under the content hash
+    filepath = payload.get('filepath')
+    try:
+        content_hash = payload.get('content_hash') or hash_file(filepath)
+        pipeline = ResumeAnalysisPipeline(filepath, content_hash, name=payload.get('filename'))
+        # Fails when the saved upload is gone and neither the index nor the page text is cached
+        pipeline.load()
+    except FileNotFoundError as e:
+        print(f"Failed to load upload {payload.get('content_hash')}: {str(e)}")
+        raise FileNotFoundError(
+            f"The uploaded resume {payload.get('filename', '')} is no longer available. Please upload it again."
+        ) from e
+    summary = pipeline.analyze(
+        payload['job_description'],
+        mode=payload['mode'],
+        on_progress=report_progress,
+        explain_match=payload.get('explain_match', False)
+    )
+    if 'job_match' in summary:
+        JOB_MATCH_SCORE.observe(summary['job_match']['score'])
+    
+    # Make the candidate searchable across the whole corpus
+    metadata = {'summary': summary.get('summary', {}).get('answer', '')}
+    try:
+        if pipeline.vector is None and pipeline.documents is not None:
+            # Full-text path without job matching: index the pages from one batched embedding call
+            # rather than building (and caching) the resume's chunked FAISS store just for this
+            texts = [doc.page_content for doc in pipeline.documents]
+            get_candidate_index().add(
+                content_hash,
+                payload.get('filename', ''),
+                texts,
+                get_embedding_engine().embed_documents(texts),
+                pages=[doc.metadata.get('page') for doc in pipeline.documents],
+                metadata=metadata
+            )
+        else:
+            get_candidate_index().add_vector_store(content_hash, payload.get('filename', ''), pipeline.load_vector(), metadata=metadata)
+    except Exception as e:
+        print(f"Failed to index candidate {content_hash}: {str(e)}")
+    
+    return summary
+
+# Start the analysis workers; jobs left over from a previous run are resumed
+job_queue = JobQueue(
+    run_analysis_job,
+    JOB_DB_PATH,
+    workers=JOB_WORKERS,
+    max_pending=JOB_MAX_PENDING,
+    depth_gauge=JOB_QUEUE_DEPTH,
+    wait_histogram=JOB_WAIT_TIME,
+    run_histogram=JOB_RUN_TIME,
+    poll_interval=JOB_POLL_SECONDS,
+    retention=JOB_RETENTION_SECONDS
+)
+job_queue.start(recover=JOB_RECOVER_ON_START)
+
+# Load libraries and models in the background; /ready reports when they are in place
+warm_up = WarmUp(warmup_models(model_router.models()))
+if WARMUP_ON_START:
+    warm_up.start()
+
+STARTUP_TIME.set(time.time() - PROCESS_START_TIME)
+first_request_seen = False
+
 # Create request tracking middleware
 @app.before_request
 def before_request():
+    global first_request_seen
     request.start_time = time.time()
+    if not first_request_seen:
+        first_request_seen = True
+        FIRST_REQUEST_TIME.set(request.start_time - PROCESS_START_TIME)
+    # Clients may pass X-Request-ID to follow a request through the trace logs
+    request.trace_token = start_trace(request.headers.get('X-Request-ID'))
     if not request.path.startswith('/static/'):
-        ACTIVE_USERS.inc()
+        request.in_flight = True
+        IN_FLIGHT_REQUESTS.inc()
         ENDPOINTS_USAGE.labels(request.path).inc()
+        client = request.access_route[0] if request.access_route else request.remote_addr
+        with client_last_seen_lock:
+            client_last_seen[client] = request.start_time
 
 @app.after_request
 def after_request(response):
+    response.headers['X-Request-ID'] = current_trace_id()
     if not request.path.startswith('/static/'):
         request_latency = time.time() - request.start_time
         REQUESTS.labels(request.method, request.path, response.status_code).inc()
         REQUEST_TIME.labels(request.method, request.path).observe(request_latency)
-        ACTIVE_USERS.dec()
     return response
 
+@app.teardown_request
+def teardown_request(exception=None):
+    # Runs even when a view raises, so the gauge cannot drift upwards
+    if getattr(request, 'in_flight', False):
+        IN_FLIGHT_REQUESTS.dec()
+    if getattr(request, 'trace_token', None) is not None:
+        end_trace(request.trace_token)
+
 # Add metrics endpoint
 @app.route('/metrics')
 def metrics():
     update_system_metrics()  # Update metrics before serving
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Aggregate the metric files written by every gunicorn worker
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), 200, {'Content-Type': CONTENT_TYPE_LATEST}
     return generate_latest(REGISTRY), 200, {'Content-Type': CONTENT_TYPE_LATEST}
 
+@app.route('/health')
+def health():
+    """Liveness: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/ready')
+def ready():
+    """Readiness: the embedding model and pipeline libraries are loaded"""
+    if not WARMUP_ON_START:
+        return jsonify({'status': 'ready', 'warmup': 'disabled'})
+    status = 'ready' if warm_up.ready else 'warming_up'
+    return jsonify({'status': status, **warm_up.report()}), 200 if warm_up.ready else 503
+
 @app.route('/')
 def index(): 
     return render_template('index.html')
@@ -110,110 +270,162 @@ def upload_resume():
         return jsonify({'status': 'error', 'message': 'No selected file'})
         
     if file and allowed_file(file.filename):
-        # Create unique filename to avoid collisions
-        filename = str(uuid.uuid4()) + '_' + secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
-        
-        # Generate structured summary using predefined questions
-        summary = {}
-        
-        # Predefined questions to ask about the resume
-        questions = {
-            'skills': 'What are the key skills mentioned in this resume?',
-            'experience': 'Summarize the work experience in this resume.',
-            'education': 'What is the educational background in this resume?',
-            'projects': 'What projects are mentioned in this resume?',
-            'summary': 'Provide a concise professional summary of this candidate based on the resume.'
-        }
-        
-        # Process each question
-        for category, question in questions.items():
-            result = query_pdf(filepath, question)
-            if result["status"] == "success":
-                summary[category] = {
-                    'answer': result["answer"],
-                    'sources': result.get("sources", [])
-                }
-            else:
-                summary[category] = {
-                    'answer': f"Error analyzing {category}: {result.get('message', 'Unknown error')}",
-                    'sources': []
-                }
+        # Keep the upload for its job outside the evictable caches; the job worker parses it
+        filename = secure_filename(file.filename)
+        _, content_hash, upload = read_upload(file)
+        try:
+            filepath = upload.save()
+        finally:
+            upload.discard()
         
-        # Job description analysis if provided
+        # Queue the analysis; clients poll /jobs/<job_id> for progress and the summary
         job_description = request.form.get('jobDescription', '').strip()
-        if job_description:
-            match_analysis = {
-                'score': 0,
-                'analysis': '',
-                'recommendations': ''
-            }
-            
-            # Calculate match score and analysis
-            job_analysis_prompt = f"""
-            Compare the following resume summary with the job description:
-
-            Resume Summary:
-            Skills: {summary['skills']['answer']}
-            Experience: {summary['experience']['answer']}
-            Education: {summary['education']['answer']}
-            Projects: {summary['projects']['answer']}
-
-            Job Description:
-            {job_description}
-
-            Provide:
-            1. A match score from 0-100 indicating how well the candidate matches the job requirements
-            2. A brief analysis of the match, highlighting strengths and gaps
-            3. Recommendations for the candidate to improve their match for this position
-            """
-            
-            match_result = query_pdf(filepath, job_analysis_prompt)
-            if match_result["status"] == "success":
-                # Parse the response to extract score, analysis and recommendations
-                response_text = match_result["answer"]
-                
-                # Try to extract score
-                score_match = re.search(r'(\d{1,3})(?:\s*\/\s*100|\s*\%)', response_text)
-                if score_match:
-                    match_analysis['score'] = int(score_match.group(1))
-                
-                # Split response into sections
-                sections = response_text.split('\n\n')
-                if len(sections) >= 2:
-                    match_analysis['analysis'] = sections[0]
-                if len(sections) >= 3:
-                    match_analysis['recommendations'] = sections[1]
-                else:
-                    match_analysis['analysis'] = response_text
-                    
-            summary['job_match'] = match_analysis
-        
-        # Clean up the file after analysis
+        analysis_mode = request.form.get('analysisMode', '').strip()
+        if analysis_mode not in ANALYSIS_MODES:
+            analysis_mode = None
+
         try:
+            job_id = job_queue.submit({
+                'content_hash': content_hash,
+                'filepath': filepath,
+                'filename': filename,
+                'job_description': job_description,
+                'mode': analysis_mode,
+                'explain_match': request.form.get('explainMatch', '').strip().lower() in ('1', 'true', 'yes', 'on'),
+                'trace_id': current_trace_id()
+            })
+        except QueueFull:
             os.remove(filepath)
-        except:
-            pass
-            
-        return jsonify({'status': 'success', 'summary': summary})
+            return jsonify({'status': 'error', 'message': 'Server is busy, please try again later'}), 503
+
+        return jsonify({
+            'status': 'queued',
+            'job_id': job_id,
+            'status_url': url_for('job_status', job_id=job_id),
+            'events_url': url_for('job_events', job_id=job_id)
+        }), 202
         
     return jsonify({'status': 'error', 'message': 'Only PDF files are allowed'})
     
+@app.route('/rank', methods=['POST'])
+def rank_resumes():
+    """Rank many resumes against one job description, streaming newline-delimited JSON events"""
+    job_description = request.form.get('jobDescription', '').strip()
+    if not job_description:
+        return jsonify({'status': 'error', 'message': 'Job description is required'})
+    
+    files = [file for file in request.files.getlist('resumes') if file and allowed_file(file.filename)]
+    if not files:
+        return jsonify({'status': 'error', 'message': 'At least one PDF resume is required'})
+    
+    try:
+        # Resumes given an LLM analysis; 0 only pre-ranks
+        top_k = min(max(0, int(request.form.get('top_k', RANKING_TOP_K))), len(files))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'top_k must be an integer'}), 400
+    
+    resumes = {}
+    uploads = []
+    for file in files:
+        source, _, upload = read_upload(file)
+        uploads.append(upload)
+        candidate = file.filename
+        copy = 1
+        while candidate in resumes:
+            copy += 1
+            candidate = f"{file.filename} ({copy})"
+        resumes[candidate] = source
+    
+    def generate():
+        try:
+            for event in rank_candidates(resumes, job_description, top_k=top_k):
+                yield json.dumps(event) + '\n'
+        finally:
+            # Delete any uploads that spilled to temp files
+            for upload in uploads:
+                upload.discard()
+    
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/search', methods=['GET'])
+def search_candidates():
+    """Top candidates across every processed resume for a skill query, without calling the LLM"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'status': 'error', 'message': 'Query parameter q is required'}), 400
+    
+    try:
+        top_k = min(max(1, int(request.args.get('k', 10))), 100)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'Query parameter k must be an integer'}), 400
+    search_start_time = time.time()
+    results = get_candidate_index().search(get_embedding_engine().embed_query(query), top_candidates=top_k)
+    
+    return jsonify({
+        'status': 'success',
+        'results': results,
+        'took_ms': round((time.time() - search_start_time) * 1000, 2)
+    })
+
+@app.route('/candidates/<candidate_id>', methods=['DELETE'])
+def delete_candidate(candidate_id):
+    if not get_candidate_index().delete(candidate_id):
+        return jsonify({'status': 'error', 'message': 'Candidate not found'}), 404
+    return jsonify({'status': 'success'})
+
+def job_response(job):
+    """Public view of a job; finished jobs carry the same summary as the old synchronous /upload"""
+    response = {'status': job['status'], 'job_id': job['id'], 'progress': job['progress']}
+    if job['status'] == SUCCESS:
+        response['summary'] = job['result']
+    elif job['status'] == ERROR:
+        response['message'] = job['error']
+    return response
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+    return jsonify(job_response(job))
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Server-sent events: one 'progress' event per finished category, then 'done' (or 'gone' if the job is purged)"""
+    if job_queue.get(job_id) is None:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+
+    def generate():
+        sent = set()
+        last_keep_alive = time.time()
+        while True:
+            job = job_queue.get(job_id)
+            if job is None:
+                # Purged by job retention while the client was still listening
+                yield f"event: gone\ndata: {json.dumps({'status': 'error', 'message': 'Job not found'})}\n\n"
+                return
+            for category, entry in job['progress'].items():
+                if category not in sent:
+                    sent.add(category)
+                    yield f"event: progress\ndata: {json.dumps({'category': category, 'result': entry})}\n\n"
+            if job['status'] in (SUCCESS, ERROR):
+                yield f"event: done\ndata: {json.dumps(job_response(job))}\n\n"
+                return
+            job_queue.wait_for_change(timeout=15)
+            # Keep idle connections open through proxies
+            if time.time() - last_keep_alive >= 15:
+                last_keep_alive = time.time()
+                yield ": keep-alive\n\n"
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
 @app.route('/about', methods=['GET'])
 def about():
     return render_template('about.html')
 
-@app.route('/job-generator', methods=['GET', 'POST'])
-def job_generator():
-    if request.method == 'POST':
-        job_data = request.form.get('jobDescription', '').strip()
-        
-        if not job_data:
-            return jsonify({'status': 'error', 'message': 'Job description is required'})
-        
-        # Generate comprehensive job details using LLM
-        job_analysis_prompt = f"""
+def job_plan_prompt(job_data):
+    """Prompt for the hiring plan and job analysis report"""
+    return f"""
         Create a comprehensive hiring plan and job analysis report based on this job description:
 
         {job_data}
@@ -228,87 +440,193 @@ def job_generator():
         7. MARKET INSIGHTS: Salary range, talent pool availability, and hiring timeline
         8. ONBOARDING PLAN: 30-60-90 day success metrics for the new hire
         """
+
+def interview_questions_prompt(job_title, experience_level, skills, question_count):
+    """Prompt for a categorised interview question set"""
+    return f"""
+        Generate {question_count} interview questions for a {job_title} position
+        Experience level: {experience_level if experience_level else 'Any'}
+        Required skills: {skills if skills else 'General technical skills'}
         
+        Format your response as a numbered list of questions, grouped into these categories:
+        - Technical Questions
+        - Behavioral Questions
+        - Problem-Solving Questions
+        - Culture Fit Questions
+        
+        For each technical question, also provide an ideal answer or key points that should be covered in the response.
+        """
+
+def interview_questions_form():
+    """Read the interview question form; returns (prompt, error message)"""
+    job_title = request.form.get('job_title', '').strip()
+    experience_level = request.form.get('experience_level', '').strip()
+    skills = request.form.get('skills', '').strip()
+    question_count = int(request.form.get('question_count', 10))
+    
+    if not job_title:
+        return None, 'Job title is required'
+    
+    return interview_questions_prompt(job_title, experience_level, skills, question_count), None
+
+def wants_regeneration():
+    """True when the client asked to bypass the response cache"""
+    return request.form.get('regenerate', '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+def cached_response(task, prompt):
+    """A cached answer to prompt from any model the task routes to, best tier first.
+
+    Answers are stored under the model that produced them, which after a
+    fallback is not the one the next request would be routed to.
+    """
+    return response_cache.get_first([tier['model'] for tier in model_router.tiers(task)], prompt, task)
+
+def stream_chat(request_type, prompt, regenerate=False):
+    """Stream a chat completion for an LLM task to the browser as server-sent events.
+
+    Each 'message' event carries {"token": ...}; the stream ends with a
+    'done' event, or an 'error' event if generation fails. Cached responses
+    are sent as a single token event.
+    """
+    cached = None if regenerate else cached_response(request_type, prompt)
+    if cached is not None:
+        def replay():
+            yield f"data: {json.dumps({'token': cached})}\n\n"
+            yield f"event: done\ndata: {json.dumps({'cached': True})}\n\n"
+
+        return Response(replay(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+    # Routed only on a cache miss, so cached replies do not count as routing decisions
+    route = model_router.route(request_type)
+    model = route.model
+    # Wait for a model slot before opening the stream so overload is a plain 429/503
+    llm_start_time = time.time()
+    try:
+        stream = llm_gateway.chat(
+            model,
+            [{'role': 'user', 'content': prompt}],
+            priority=INTERACTIVE,
+            stream=True,
+            request_type=request_type,
+            timeout=route.timeout,
+        )
+    except GatewayBusy as e:
+        return jsonify({'status': 'error', 'message': str(e)}), e.status_code
+
+    def generate():
+        first_token_time = None
         try:
-            # Track LLM request time
-            llm_start_time = time.time()
+            parts = []
+            for chunk in stream:
+                content = chunk['message']['content']
+                parts.append(content)
+                if content and first_token_time is None:
+                    first_token_time = time.time()
+                    LLM_TIME_TO_FIRST_TOKEN.labels(model, request_type).observe(first_token_time - llm_start_time)
+                if content:
+                    yield f"data: {json.dumps({'token': content})}\n\n"
             
-            # Use Ollama client to chat with the model
-            response = ollama_client.chat(
-                model='llama3.2:1b',
-                messages=[{'role': 'user', 'content': job_analysis_prompt}],
-                stream=False,
+            # Latency and token counts are recorded by the gateway from the final chunk
+            response_cache.set(model, prompt, ''.join(parts))
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+        finally:
+            # Frees the model slot even if the browser disconnects mid-stream
+            stream.close()
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/job-generator', methods=['GET', 'POST'])
+def job_generator():
+    if request.method == 'POST':
+        job_data = request.form.get('jobDescription', '').strip()
+        
+        if not job_data:
+            return jsonify({'status': 'error', 'message': 'Job description is required'})
+        
+        # Generate comprehensive job details using LLM
+        job_analysis_prompt = job_plan_prompt(job_data)
+        
+        if not wants_regeneration():
+            cached = cached_response('job_generator', job_analysis_prompt)
+            if cached is not None:
+                return jsonify({'status': 'success', 'analysis': cached, 'cached': True})
+        
+        try:
+            # Falls back to a smaller model if the routed one times out or is busy
+            model, response = model_router.chat(
+                'job_generator',
+                [{'role': 'user', 'content': job_analysis_prompt}],
+                priority=INTERACTIVE,
             )
             
-            # Record metrics
-            llm_duration = time.time() - llm_start_time
-            LLM_REQUEST_TIME.labels('llama3.2:1b', 'job_generator').observe(llm_duration)
-            LLM_TOKEN_USAGE.labels('llama3.2:1b', 'job_generator').inc(max(1, len(job_analysis_prompt) // 4))
-            
             # Extract the answer from the response
             answer = response['message']['content']
+            response_cache.set(model, job_analysis_prompt, answer)
             
             return jsonify({
                 'status': 'success', 
                 'analysis': answer
             })
+        except GatewayBusy as e:
+            return jsonify({'status': 'error', 'message': str(e)}), e.status_code
         except Exception as e:
             return jsonify({'status': 'error', 'message': str(e)})
     
     # GET request - render the form template
     return render_template('job_generator.html')
 
+@app.route('/job-generator/stream', methods=['POST'])
+def job_generator_stream():
+    job_data = request.form.get('jobDescription', '').strip()
+    
+    if not job_data:
+        return jsonify({'status': 'error', 'message': 'Job description is required'})
+    
+    return stream_chat('job_generator', job_plan_prompt(job_data), wants_regeneration())
+
 @app.route('/interview-questions', methods=['GET', 'POST'])
 def interview_questions():
     if request.method == 'POST':
-        job_title = request.form.get('job_title', '').strip()
-        experience_level = request.form.get('experience_level', '').strip()
-        skills = request.form.get('skills', '').strip()
-        question_count = int(request.form.get('question_count', 10))
+        prompt, error = interview_questions_form()
+        if error:
+            return jsonify({'status': 'error', 'message': error})
         
-        if not job_title:
-            return jsonify({'status': 'error', 'message': 'Job title is required'})
-        
-        prompt = f"""
-        Generate {question_count} interview questions for a {job_title} position
-        Experience level: {experience_level if experience_level else 'Any'}
-        Required skills: {skills if skills else 'General technical skills'}
-        
-        Format your response as a numbered list of questions, grouped into these categories:
-        - Technical Questions
-        - Behavioral Questions
-        - Problem-Solving Questions
-        - Culture Fit Questions
-        
-        For each technical question, also provide an ideal answer or key points that should be covered in the response.
-        """
+        if not wants_regeneration():
+            cached = cached_response('interview_questions', prompt)
+            if cached is not None:
+                return jsonify({'status': 'success', 'questions': cached, 'cached': True})
         
         try:
-            # Track LLM request time
-            llm_start_time = time.time()
-            
-            response = ollama_client.chat(
-                model='llama3.2:1b',
-                messages=[{'role': 'user', 'content': prompt}],
-                stream=False,
+            model, response = model_router.chat(
+                'interview_questions',
+                [{'role': 'user', 'content': prompt}],
+                priority=INTERACTIVE,
             )
             
-            # Record metrics
-            llm_duration = time.time() - llm_start_time
-            LLM_REQUEST_TIME.labels('llama3.2:1b', 'interview_questions').observe(llm_duration)
-            LLM_TOKEN_USAGE.labels('llama3.2:1b', 'interview_questions').inc(max(1, len(prompt) // 4))
-            
             questions = response['message']['content']
+            response_cache.set(model, prompt, questions)
             
             return jsonify({
                 'status': 'success',
                 'questions': questions
             })
+        except GatewayBusy as e:
+            return jsonify({'status': 'error', 'message': str(e)}), e.status_code
         except Exception as e:
             return jsonify({'status': 'error', 'message': str(e)})
     
     return render_template('interview_questions.html')
 
+@app.route('/interview-questions/stream', methods=['POST'])
+def interview_questions_stream():
+    prompt, error = interview_questions_form()
+    if error:
+        return jsonify({'status': 'error', 'message': error})
+    
+    return stream_chat('interview_questions', prompt, wants_regeneration())
+
 @app.route('/contact', methods=['GET', 'POST'])
 def contact():
     if request.method == 'POST':
@@ -327,4 +645,4 @@ def contact():
 
 if __name__ == '__main__':
     # Add psutil to requirements.txt
-    app.run(debug=False, host='0.0.0.0', port=5001)
\ No newline at end of file
+    app.run(debug=False, host='0.0.0.0', port=int(os.environ.get('PORT', 5001)))
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""Compare the Hugging_face index build with and without pooled chunk vectors.
+
+The baseline splits with SemanticChunker and embeds every chunk again in
+FAISS.from_documents; the pooled build reuses the chunker's sentence
+vectors. Prints encoder calls, texts encoded, build time and how many of
+the baseline's top-k chunks the pooled index also retrieves, as JSON.
+
+    python benchmarks/bench_chunk_embeddings.py Resume_Yash_Borkar.pdf --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'Hugging_face'))
+
+from langchain_core.embeddings import Embeddings
+from langchain_community.vectorstores import FAISS
+from langchain_experimental.text_splitter import SemanticChunker
+from langchain_huggingface import HuggingFaceEmbeddings
+from pdf_extraction import extract_documents
+from pooled_chunker import PooledSemanticChunker
+
+QUERIES = [
+    "What are the candidate's technical skills?",
+    "Describe the candidate's work experience.",
+    "What is the candidate's educational background?",
+    "What projects has the candidate worked on?"
+]
+
+
+class CountingEmbeddings(Embeddings):
+    """Pass-through embeddings that count encoder calls and texts"""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.calls = 0
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        self.texts += 1
+        return self.embeddings.embed_query(text)
+
+
+def build_baseline(docs, embedder):
+    documents = SemanticChunker(embedder).split_documents(docs)
+    return FAISS.from_documents(documents, embedder)
+
+
+def build_pooled(docs, embedder):
+    documents, vectors = PooledSemanticChunker(embedder).split_documents_with_vectors(docs)
+    return FAISS.from_embeddings(
+        [(doc.page_content, vector) for doc, vector in zip(documents, vectors)],
+        embedder,
+        metadatas=[doc.metadata for doc in documents]
+    )
+
+
+def run(build, docs, model, runs):
+    seconds = []
+    for _ in range(runs):
+        embedder = CountingEmbeddings(model)
+        started = time.time()
+        vector = build(docs, embedder)
+        seconds.append(time.time() - started)
+    return vector, {
+        'encoder_calls': embedder.calls,
+        'texts_encoded': embedder.texts,
+        'chunks': vector.index.ntotal,
+        'build_mean_s': statistics.mean(seconds),
+        'build_min_s': min(seconds)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pooled chunk vectors against re-embedding chunks")
+    parser.add_argument("pdf_path", help="Path to the resume PDF")
+    parser.add_argument("--runs", type=int, default=3, help="Builds per variant")
+    parser.add_argument("-k", type=int, default=3, help="Chunks retrieved per query when comparing results")
+    args = parser.parse_args()
+
+    docs = extract_documents(args.pdf_path)
+    model = HuggingFaceEmbeddings()
+    # Load the model before timing either variant
+    model.embed_query("warm up")
+
+    baseline, baseline_stats = run(build_baseline, docs, model, args.runs)
+    pooled, pooled_stats = run(build_pooled, docs, model, args.runs)
+
+    overlap = []
+    for query in QUERIES:
+        query_vector = model.embed_query(query)
+        expected = {doc.page_content for doc in baseline.similarity_search_by_vector(query_vector, k=args.k)}
+        found = {doc.page_content for doc in pooled.similarity_search_by_vector(query_vector, k=args.k)}
+        overlap.append(len(expected & found) / max(len(expected), 1))
+
+    print(json.dumps({
+        'baseline': baseline_stats,
+        'pooled': pooled_stats,
+        'top_k_overlap_mean': statistics.mean(overlap)
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Retrieval parity and throughput of the torch and ONNX Runtime embedding backends.
+
+Chunks the PDFs with the app's settings (rag.py), embeds every chunk with
+each backend and compares against torch:
+
+    min_cosine        lowest cosine similarity between a chunk's torch and backend vector
+    topk_overlap      share of torch's top-k chunks per query the backend also retrieves
+    texts_per_s       chunk encoding throughput (median of --runs)
+
+Exits with status 1 if any backend's top-k overlap is below --min-overlap
+or its min_cosine below --min-cosine, so it can run as a parity check.
+
+    python benchmarks/bench_embedding_backends.py --threads 4 --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from embedding_backends import BackendEmbeddings
+from pdf_extraction import extract_documents
+import rag
+
+BUNDLED_PDFS = [
+    os.path.join(ROOT, 'Resume_Yash_Borkar.pdf'),
+    os.path.join(ROOT, 'Hugging_face', 'John Doe.pdf'),
+    os.path.join(ROOT, 'Hugging_face', 'Job Title.pdf')
+]
+
+# The main app's model and the Hugging_face demo's
+MODELS = [rag.EMBEDDING_MODEL_NAME, 'sentence-transformers/all-mpnet-base-v2']
+
+QUERIES = [
+    "What are the key skills mentioned in this resume?",
+    "Summarize the work experience in this resume.",
+    "What is the educational background in this resume?",
+    "What projects are mentioned in this resume?",
+    "Provide a concise professional summary of this candidate based on the resume."
+]
+
+VARIANTS = {
+    'onnx': {'backend': 'onnx', 'quantize': False},
+    'onnx_int8': {'backend': 'onnx', 'quantize': True}
+}
+
+
+def load_chunks(pdf_paths):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=rag.CHUNK_SIZE, chunk_overlap=rag.CHUNK_OVERLAP, length_function=len)
+    return [doc.page_content for doc in splitter.split_documents(
+        [doc for pdf_path in pdf_paths for doc in extract_documents(pdf_path)]
+    )]
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def encode(embeddings, chunks, runs):
+    """Return (normalized chunk vectors, median texts per second)"""
+    embeddings.embed_documents(chunks[:4])
+    rates = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        vectors = embeddings.embed_documents(chunks)
+        rates.append(len(chunks) / (time.perf_counter() - started))
+    return normalize(vectors), statistics.median(rates)
+
+
+def top_k(chunk_vectors, query_vectors, k):
+    return [set(np.argsort(-scores)[:k]) for scores in query_vectors @ chunk_vectors.T]
+
+
+def compare_model(model_name, chunks, args):
+    reference = BackendEmbeddings(model_name, backend='torch', threads=args.threads)
+    torch_vectors, torch_rate = encode(reference, chunks, args.runs)
+    torch_queries = normalize(reference.embed_documents(QUERIES))
+    torch_top = top_k(torch_vectors, torch_queries, args.k)
+
+    result = {'model': model_name, 'chunks': len(chunks), 'torch': {'texts_per_s': torch_rate}}
+    for name, variant in VARIANTS.items():
+        embeddings = BackendEmbeddings(model_name, threads=args.threads, **variant)
+        vectors, rate = encode(embeddings, chunks, args.runs)
+        queries = normalize(embeddings.embed_documents(QUERIES))
+        overlaps = [len(a & b) / len(a) for a, b in zip(torch_top, top_k(vectors, queries, args.k)) if a]
+        result[name] = {
+            'texts_per_s': rate,
+            'speedup': rate / torch_rate,
+            'min_cosine': float((vectors * torch_vectors).sum(axis=1).min()),
+            'topk_overlap': min(overlaps) if overlaps else 1.0
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the torch and ONNX embedding backends")
+    parser.add_argument("pdf_paths", nargs="*", help="PDFs to chunk (default: the bundled resumes)")
+    parser.add_argument("--models", nargs="+", default=MODELS, help="Sentence-transformer models to compare")
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads per backend (0: runtime default)")
+    parser.add_argument("--runs", type=int, default=3, help="Timed encodes per backend")
+    parser.add_argument("-k", type=int, default=rag.RETRIEVAL_K, help="Retrieved chunks per query")
+    parser.add_argument("--min-overlap", type=float, default=2 / 3, help="Lowest acceptable top-k overlap")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Lowest acceptable per-chunk cosine")
+    args = parser.parse_args()
+
+    chunks = load_chunks([os.path.abspath(path) for path in args.pdf_paths] or BUNDLED_PDFS)
+    results = [compare_model(model_name, chunks, args) for model_name in args.models]
+    print(json.dumps({'threads': args.threads, 'k': args.k, 'results': results}, indent=2))
+
+    failed = [
+        f"{result['model']} {name}"
+        for result in results for name in VARIANTS
+        if result[name]['topk_overlap'] < args.min_overlap or result[name]['min_cosine'] < args.min_cosine
+    ]
+    if failed:
+        print(f"Parity check failed: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""Offline, per-stage benchmark of query_pdf and the /upload flow.
+
+Runs against a local fake Ollama server (see fake_ollama.py) with
+configurable latency and generation speed, and a throwaway working
+directory for every cache, so results only depend on this machine and the
+settings in rag.py. By default it uses the bundled resumes plus synthetic
+PDFs of --synthetic-pages pages. Prints JSON with, per PDF:
+
+    stages     seconds for parse, split, embed, index, retrieve and llm (median of --runs)
+    prompt_tokens  retrieval-path prompt tokens with plain top-k context ('baseline')
+               and with the token-budgeted context ('budgeted')
+    query_pdf  end-to-end seconds with a cold and a warm embedding cache, and
+               the context path taken ('full_text' or 'retrieval')
+    upload     seconds from POST /upload to a finished job, cold and warm
+    throughput pages/s, chunks/s and LLM tokens/s
+
+and the peak RSS of the process. Run once with the default
+--full-text-budget and once with 0 to see what the small-document fast
+path saves.
+
+    python benchmarks/bench_pipeline.py --runs 3 --latency-ms 200 --tokens-per-second 40
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import start_fake_ollama
+
+BUNDLED_PDFS = [
+    os.path.join(ROOT, 'Resume_Yash_Borkar.pdf'),
+    os.path.join(ROOT, 'Hugging_face', 'John Doe.pdf'),
+    os.path.join(ROOT, 'Hugging_face', 'Job Title.pdf')
+]
+
+QUESTION = "What are the key skills mentioned in this resume?"
+JOB_DESCRIPTION = """Senior Python developer
+- Required: 5+ years of Python and Flask
+- Experience with machine learning and vector search
+- Nice to have: Docker and Prometheus"""
+
+SYNTHETIC_LINES = [
+    "Software Engineer, Example Corp (2019 - 2024)",
+    "Built and operated Flask services handling resume parsing and search for recruiters.",
+    "Led migration of batch jobs to a queue-based worker pool, cutting processing time in half.",
+    "Skills: Python, Flask, SQL, Docker, Kubernetes, FAISS, PyTorch, Prometheus, Grafana.",
+    "Education: B.Sc. Computer Science, Example University (2015 - 2019).",
+    "Project: semantic candidate search using sentence embeddings and approximate nearest neighbours.",
+]
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def make_synthetic_pdf(path, pages, lines_per_page=45):
+    """Write a text-only PDF of resume-like lines using the built-in Helvetica font"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in range(pages):
+        lines = [f"Page {page + 1}"] + [
+            SYNTHETIC_LINES[(page + i) % len(SYNTHETIC_LINES)] for i in range(lines_per_page)
+        ]
+        text = "BT /F1 10 Tf 14 TL 50 800 Td " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET"
+        stream = text.encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append((
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode('ascii'))
+        page_ids.append(len(objects))
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode('ascii')
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        data += b"%010d 00000 n \n" % offset
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def peak_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def clear_embedding_cache():
+    from embedding_store import get_embedding_store
+    store = get_embedding_store()
+    shutil.rmtree(store.cache_dir, ignore_errors=True)
+    os.makedirs(store.cache_dir, exist_ok=True)
+
+
+def time_stages(pdf_path):
+    """Run every query_pdf stage once with no caches and time each"""
+    from langchain_core.documents import Document
+    from langchain_community.vectorstores import FAISS
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from embedding_engine import get_embedding_engine
+    from llm_gateway import get_llm_gateway, INTERACTIVE
+    from model_router import get_model_router
+    from pdf_extraction import extract_pages, PDF_EXTRACTION_BACKEND
+    from context_builder import build_context, relevance, CONTEXT_FETCH_K
+    from tokens import count_tokens
+    import rag
+
+    timings = {}
+
+    started = time.perf_counter()
+    pages = extract_pages(pdf_path, 'pypdfium2' if PDF_EXTRACTION_BACKEND == 'auto' else PDF_EXTRACTION_BACKEND)
+    docs = [Document(page_content=text, metadata={'source': pdf_path, 'page': page}) for page, text in pages]
+    timings['parse'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=rag.CHUNK_SIZE, chunk_overlap=rag.CHUNK_OVERLAP, length_function=len, add_start_index=True)
+    chunks = splitter.split_documents(docs)
+    timings['split'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    engine = get_embedding_engine()
+    vectors = engine.embed_documents([chunk.page_content for chunk in chunks])
+    timings['embed'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vector = FAISS.from_embeddings(
+        [(chunk.page_content, embedding) for chunk, embedding in zip(chunks, vectors)],
+        engine,
+        metadatas=[chunk.metadata for chunk in chunks]
+    )
+    timings['index'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scored = [(doc, relevance(distance)) for doc, distance in vector.similarity_search_with_score(QUESTION, k=CONTEXT_FETCH_K)]
+    timings['retrieve'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    baseline = rag.QA_PROMPT.format(context=rag.format_context([doc for doc, _ in scored[:rag.RETRIEVAL_K]]), question=QUESTION)
+    prompt = rag.QA_PROMPT.format(context=build_context(scored)[0], question=QUESTION)
+    response = get_llm_gateway().generate(get_model_router().route('qa').model, prompt, priority=INTERACTIVE)
+    timings['llm'] = time.perf_counter() - started
+
+    return timings, {
+        'pages': len(pages),
+        'chunks': len(chunks),
+        'completion_tokens': response.get('eval_count', 0),
+        'prompt_tokens': {'baseline': count_tokens(baseline), 'budgeted': count_tokens(prompt)}
+    }
+
+
+def time_query_pdf(pdf_path, runs):
+    import rag
+
+    clear_embedding_cache()
+    started = time.perf_counter()
+    result = rag.query_pdf(pdf_path, QUESTION)
+    cold = time.perf_counter() - started
+    if result['status'] != 'success':
+        raise RuntimeError(result['message'])
+
+    warm = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        rag.query_pdf(pdf_path, QUESTION)
+        warm.append(time.perf_counter() - started)
+    path = 'full_text' if rag.load_full_text(pdf_path) is not None else 'retrieval'
+    return {'cold_s': cold, 'warm_s': statistics.median(warm), 'context_path': path}
+
+
+def upload_once(client, pdf_path, mode):
+    with open(pdf_path, 'rb') as f:
+        data = {'resume': (f, os.path.basename(pdf_path)), 'jobDescription': JOB_DESCRIPTION}
+        if mode:
+            data['analysisMode'] = mode
+        started = time.perf_counter()
+        response = client.post('/upload', data=data, content_type='multipart/form-data')
+    if response.status_code != 202:
+        raise RuntimeError(f"upload failed: {response.status_code} {response.get_data(as_text=True)}")
+    status_url = response.get_json()['status_url']
+
+    while True:
+        job = client.get(status_url).get_json()
+        if job['status'] in ('success', 'error'):
+            break
+        time.sleep(0.02)
+    if job['status'] == 'error':
+        raise RuntimeError(f"analysis failed: {job.get('message')}")
+    return time.perf_counter() - started
+
+
+def time_upload(pdf_path, runs, mode):
+    import app as web
+
+    client = web.app.test_client()
+    clear_embedding_cache()
+    cold = upload_once(client, pdf_path, mode)
+    warm = [upload_once(client, pdf_path, mode) for _ in range(runs)]
+    return {'cold_s': cold, 'warm_s': statistics.median(warm)}
+
+
+def benchmark_pdf(pdf_path, runs, mode, skip_upload):
+    stage_runs = []
+    for _ in range(runs):
+        clear_embedding_cache()
+        timings, counts = time_stages(pdf_path)
+        stage_runs.append(timings)
+    stages = {stage: statistics.median(run[stage] for run in stage_runs) for stage in stage_runs[0]}
+
+    result = {
+        'pdf': os.path.relpath(pdf_path, ROOT) if pdf_path.startswith(ROOT) else os.path.basename(pdf_path),
+        'pages': counts['pages'],
+        'chunks': counts['chunks'],
+        'stages': stages,
+        'prompt_tokens': counts['prompt_tokens'],
+        'query_pdf': time_query_pdf(pdf_path, runs),
+        'throughput': {
+            'parse_pages_per_s': counts['pages'] / stages['parse'] if stages['parse'] else None,
+            'embed_chunks_per_s': counts['chunks'] / stages['embed'] if stages['embed'] else None,
+            'llm_tokens_per_s': counts['completion_tokens'] / stages['llm'] if stages['llm'] else None
+        }
+    }
+    if not skip_upload:
+        result['upload'] = time_upload(pdf_path, runs, mode)
+    result['peak_rss_bytes'] = peak_rss_bytes()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline per-stage benchmark of the RAG pipeline")
+    parser.add_argument("pdf_paths", nargs="*", help="PDFs to benchmark (default: the bundled resumes)")
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions per measurement")
+    parser.add_argument("--synthetic-pages", type=int, nargs="*", default=[10, 50], help="Sizes of generated PDFs")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Fake Ollama delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=40, help="Fake Ollama generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=60, help="Tokens per fake Ollama response")
+    parser.add_argument("--mode", default=None, help="Analysis mode for /upload (default: the app's)")
+    parser.add_argument("--full-text-budget", type=int, default=None, help="FULL_TEXT_TOKEN_BUDGET for this run (0: always retrieve)")
+    parser.add_argument("--skip-upload", action="store_true", help="Only benchmark query_pdf")
+    parser.add_argument("-o", "--output", help="Write the JSON report to this file as well")
+    args = parser.parse_args()
+
+    pdf_paths = [os.path.abspath(path) for path in args.pdf_paths] or list(BUNDLED_PDFS)
+    output = os.path.abspath(args.output) if args.output else None
+
+    server = start_fake_ollama(args.latency_ms / 1000, args.tokens_per_second, args.completion_tokens)
+    workdir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    for pages in args.synthetic_pages:
+        pdf_paths.append(make_synthetic_pdf(os.path.join(workdir, f"synthetic_{pages}_pages.pdf"), pages))
+
+    # Settings are read at import time, so configure before importing the app modules
+    os.environ['OLLAMA_HOST'] = server.url
+    os.environ['LLM_CACHE_BACKEND'] = 'off'
+    if args.full_text_budget is not None:
+        os.environ['FULL_TEXT_TOKEN_BUDGET'] = str(args.full_text_budget)
+    os.environ['EMBEDDING_CACHE_DIR'] = os.path.join(workdir, 'embedding_cache')
+    os.environ['JOB_DB_PATH'] = os.path.join(workdir, 'jobs.db')
+    os.environ['CANDIDATE_INDEX_DIR'] = os.path.join(workdir, 'candidate_index')
+    os.chdir(workdir)
+
+    try:
+        started = time.perf_counter()
+        from embedding_engine import get_embedding_engine
+        get_embedding_engine().embed_query("warm up")
+        model_load = time.perf_counter() - started
+
+        results = [benchmark_pdf(path, args.runs, args.mode, args.skip_upload) for path in pdf_paths]
+        report = {
+            'settings': {
+                'runs': args.runs,
+                'latency_ms': args.latency_ms,
+                'tokens_per_second': args.tokens_per_second,
+                'completion_tokens': args.completion_tokens
+            },
+            'model_load_s': model_load,
+            'pdfs': results,
+            'llm_requests': server.requests,
+            'peak_rss_bytes': peak_rss_bytes()
+        }
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(report, indent=2))
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Prompt evaluation per LLM call of one resume analysis, with and without a shared prompt prefix.
+
+Runs ResumeAnalysisPipeline over each PDF twice, once with per-question
+contexts and once with the shared resume context that makes every prompt
+start with the same prefix (ANALYSIS_SHARED_CONTEXT). Records, per LLM
+call, the prompt tokens Ollama evaluated and its prompt_eval_duration;
+tokens served from Ollama's prompt cache are not evaluated, so the saving
+shows up in both. Prints JSON with the calls and their totals per variant.
+
+By default it runs against a fake Ollama server (see fake_ollama.py) that
+simulates prompt evaluation speed and a prompt cache. Pass --ollama-url to
+measure a real server; the analysis model must be pulled there.
+
+    python benchmarks/bench_prompt_prefix.py --prefill-tokens-per-second 150
+    python benchmarks/bench_prompt_prefix.py --ollama-url http://localhost:11434
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import start_fake_ollama
+from bench_pipeline import BUNDLED_PDFS, JOB_DESCRIPTION
+
+VARIANTS = {'per_question_context': False, 'shared_prefix': True}
+
+
+def analyze(pdf_path, shared, args):
+    from resume_pipeline import ResumeAnalysisPipeline
+
+    pipeline = ResumeAnalysisPipeline(pdf_path, max_concurrency=args.concurrency, shared_context=shared)
+    pipeline.analyze(JOB_DESCRIPTION, mode=args.mode, explain_match=True)
+    calls = [
+        {
+            'call': usage['call'],
+            'prompt_tokens': usage['prompt_tokens'],
+            'prompt_eval_s': round(usage['prompt_eval_seconds'], 4),
+            'seconds': round(usage['seconds'], 4)
+        }
+        for usage in pipeline.usage
+    ]
+    return {
+        'context_path': pipeline.context_path,
+        'calls': calls,
+        'prompt_tokens': sum(call['prompt_tokens'] for call in calls),
+        'prompt_eval_s': round(sum(call['prompt_eval_s'] for call in calls), 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt evaluation per call with and without a shared prompt prefix")
+    parser.add_argument("pdf_paths", nargs="*", help="PDFs to analyse (default: the bundled resumes)")
+    parser.add_argument("--ollama-url", help="Real Ollama server to measure instead of the fake one")
+    parser.add_argument("--mode", default='per_question', help="Analysis mode: per_question or structured")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="LLM calls in flight per analysis (CPU Ollama evaluates one at a time by default)")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Fake Ollama delay before prompt evaluation")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=150, help="Fake Ollama prompt evaluation speed")
+    parser.add_argument("--tokens-per-second", type=float, default=40, help="Fake Ollama generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=60, help="Tokens per fake Ollama response")
+    parser.add_argument("--cache-slots", type=int, default=1, help="Prompts the fake Ollama keeps cached per model")
+    args = parser.parse_args()
+
+    pdf_paths = [os.path.abspath(path) for path in args.pdf_paths] or list(BUNDLED_PDFS)
+
+    server = None
+    if args.ollama_url:
+        ollama_url = args.ollama_url
+    else:
+        server = start_fake_ollama(
+            args.latency_ms / 1000, args.tokens_per_second, args.completion_tokens,
+            prefill_tokens_per_second=args.prefill_tokens_per_second, cache_slots=args.cache_slots
+        )
+        ollama_url = server.url
+    workdir = tempfile.mkdtemp(prefix='bench_prompt_prefix_')
+
+    # Settings are read at import time, so configure before importing the app modules
+    os.environ['OLLAMA_HOST'] = ollama_url
+    os.environ['LLM_CACHE_BACKEND'] = 'off'
+    os.environ['EMBEDDING_CACHE_DIR'] = os.path.join(workdir, 'embedding_cache')
+    os.chdir(workdir)
+
+    try:
+        results = []
+        for pdf_path in pdf_paths:
+            result = {'pdf': os.path.relpath(pdf_path, ROOT) if pdf_path.startswith(ROOT) else os.path.basename(pdf_path)}
+            for name, shared in VARIANTS.items():
+                if server is not None:
+                    server.clear_cache()
+                result[name] = analyze(pdf_path, shared, args)
+            results.append(result)
+    finally:
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps({'ollama': 'real' if args.ollama_url else 'fake', 'mode': args.mode, 'results': results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
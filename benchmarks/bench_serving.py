@@ -0,0 +1,151 @@
+"""Load test of the gunicorn serving mode at several worker counts.
+
+For every --workers value, starts gunicorn with gunicorn.conf.py against a
+local fake Ollama server (see fake_ollama.py) and a throwaway working
+directory, seeds the candidate index by uploading the bundled resumes,
+then runs --concurrency client threads against GET /search for
+--duration seconds. /search embeds the query on the server, so it measures
+how CPU-bound request throughput scales with worker processes. Prints
+JSON with, per worker count:
+
+    requests_per_s   completed requests per second
+    p50_ms, p95_ms   request latency percentiles
+    errors           non-200 responses
+    rss_bytes        summed resident memory of the master and its workers
+
+    python benchmarks/bench_serving.py --workers 1 2 4 --concurrency 16 --duration 30
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import start_fake_ollama
+from bench_startup import UPLOAD_PDFS, http_get, upload, wait_for
+
+QUERIES = [
+    "python flask developer",
+    "machine learning engineer with pytorch",
+    "data analyst sql dashboards",
+    "devops docker kubernetes",
+    "frontend react javascript"
+]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+
+def load_test(base_url, concurrency, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client(offset):
+        i = offset
+        while time.time() < deadline:
+            query = urllib.parse.quote(QUERIES[i % len(QUERIES)])
+            i += 1
+            started = time.time()
+            status, _ = http_get(f"{base_url}/search?q={query}&k=5")
+            with lock:
+                if status == 200:
+                    latencies.append(time.time() - started)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+
+    return {
+        'requests_per_s': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000 if latencies else None,
+        'p95_ms': percentile(latencies, 0.95) * 1000 if latencies else None,
+        'errors': errors[0]
+    }
+
+
+def process_tree_rss(pid):
+    process = psutil.Process(pid)
+    return sum(p.memory_info().rss for p in [process] + process.children(recursive=True))
+
+
+def run_workers(workers, args, ollama_url):
+    workdir = tempfile.mkdtemp(prefix='bench_serving_')
+    env = dict(
+        os.environ,
+        PORT=str(args.port),
+        WEB_WORKERS=str(workers),
+        WEB_THREADS=str(args.threads),
+        OLLAMA_HOST=ollama_url,
+        LLM_CACHE_BACKEND='off',
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics'),
+        EMBEDDING_CACHE_DIR=os.path.join(workdir, 'embedding_cache'),
+        JOB_DB_PATH=os.path.join(workdir, 'jobs.db'),
+        CANDIDATE_INDEX_DIR=os.path.join(workdir, 'candidate_index')
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    started = time.time()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+         '--chdir', ROOT, 'app:app'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for(f"{base_url}/health", 200, started, args.timeout)
+        # Every worker must be warm before measuring, so poll /ready until several answers in a row succeed
+        ready_in_a_row = 0
+        while ready_in_a_row < workers * 4:
+            ready_in_a_row = ready_in_a_row + 1 if http_get(f"{base_url}/ready")[0] == 200 else 0
+            time.sleep(0.05)
+        for pdf_path in UPLOAD_PDFS:
+            upload(base_url, pdf_path, args.timeout)
+
+        result = {'workers': workers, 'threads': args.threads}
+        result.update(load_test(base_url, args.concurrency, args.duration))
+        result['rss_bytes'] = process_tree_rss(process.pid)
+        return result
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput of the gunicorn serving mode by worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to test")
+    parser.add_argument("--threads", type=int, default=4, help="Threads per worker")
+    parser.add_argument("--concurrency", type=int, default=16, help="Client threads")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load per worker count")
+    parser.add_argument("--port", type=int, default=5098, help="Port for the server under test")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds to wait for startup and uploads")
+    args = parser.parse_args()
+
+    server = start_fake_ollama(0.05, 200, 20)
+    try:
+        results = [run_workers(workers, args, server.url) for workers in args.workers]
+    finally:
+        server.shutdown()
+
+    print(json.dumps({'cpu_count': os.cpu_count(), 'concurrency': args.concurrency, 'results': results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Startup benchmark: time to first response, time to ready and first-upload latency.
+
+Starts app.py in a subprocess against a local fake Ollama server (see
+fake_ollama.py), with a throwaway working directory for every cache, once
+with the background warm-up and once without. Prints JSON with, per mode:
+
+    first_response_s  process start until GET /health answers
+    ready_s           process start until GET /ready answers 200
+    first_upload_s    POST /upload of the first resume until its job finishes
+    second_upload_s   the same for a different resume, with everything loaded
+    gauges            the app's own startup gauges from /metrics
+
+    python benchmarks/bench_startup.py --latency-ms 200 --tokens-per-second 40
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import start_fake_ollama
+
+UPLOAD_PDFS = [
+    os.path.join(ROOT, 'Resume_Yash_Borkar.pdf'),
+    os.path.join(ROOT, 'Hugging_face', 'John Doe.pdf')
+]
+
+STARTUP_GAUGES = (
+    'resume_analyzer_startup_seconds',
+    'resume_analyzer_time_to_first_request_seconds',
+    'resume_analyzer_first_analysis_seconds'
+)
+
+
+def http_get(url):
+    """Return (status, body) or (None, None) if nothing is listening yet"""
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except (urllib.error.URLError, ConnectionError):
+        return None, None
+
+
+def wait_for(url, status, started, timeout):
+    """Poll url until it answers with status; returns seconds since started"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if http_get(url)[0] == status:
+            return time.time() - started
+        time.sleep(0.05)
+    raise RuntimeError(f"{url} did not return {status} within {timeout}s")
+
+
+def upload(base_url, pdf_path, timeout):
+    """POST a resume to /upload and wait for the job; returns seconds"""
+    boundary = uuid.uuid4().hex
+    with open(pdf_path, 'rb') as f:
+        content = f.read()
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"resume\"; "
+        f"filename=\"{os.path.basename(pdf_path)}\"\r\nContent-Type: application/pdf\r\n\r\n"
+    ).encode('utf-8') + content + f"\r\n--{boundary}--\r\n".encode('utf-8')
+    request = urllib.request.Request(
+        f"{base_url}/upload", data=body,
+        headers={'Content-Type': f"multipart/form-data; boundary={boundary}"}
+    )
+
+    started = time.time()
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        status_url = json.loads(response.read())['status_url']
+    deadline = started + timeout
+    while time.time() < deadline:
+        job = json.loads(http_get(f"{base_url}{status_url}")[1])
+        if job['status'] in ('success', 'error'):
+            if job['status'] == 'error':
+                raise RuntimeError(f"analysis failed: {job.get('message')}")
+            return time.time() - started
+        time.sleep(0.05)
+    raise RuntimeError(f"upload of {pdf_path} did not finish within {timeout}s")
+
+
+def startup_gauges(base_url):
+    values = {}
+    for line in http_get(f"{base_url}/metrics")[1].decode('utf-8').splitlines():
+        name, _, value = line.partition(' ')
+        if name in STARTUP_GAUGES:
+            values[name] = float(value)
+    return values
+
+
+def run_mode(warmup, ollama_url, port, timeout):
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        OLLAMA_HOST=ollama_url,
+        WARMUP_ON_START='1' if warmup else '0',
+        LLM_CACHE_BACKEND='off',
+        EMBEDDING_CACHE_DIR=os.path.join(workdir, 'embedding_cache'),
+        JOB_DB_PATH=os.path.join(workdir, 'jobs.db'),
+        CANDIDATE_INDEX_DIR=os.path.join(workdir, 'candidate_index')
+    )
+    base_url = f"http://127.0.0.1:{port}"
+
+    started = time.time()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'app.py')], cwd=workdir, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        result = {'first_response_s': wait_for(f"{base_url}/health", 200, started, timeout)}
+        result['ready_s'] = wait_for(f"{base_url}/ready", 200, started, timeout)
+        result['first_upload_s'] = upload(base_url, UPLOAD_PDFS[0], timeout)
+        result['second_upload_s'] = upload(base_url, UPLOAD_PDFS[1], timeout)
+        result['gauges'] = startup_gauges(base_url)
+        return result
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Startup and first-upload benchmark of app.py")
+    parser.add_argument("--port", type=int, default=5099, help="Port for the app under test")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Fake Ollama delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=40, help="Fake Ollama generation speed")
+    parser.add_argument("--completion-tokens", type=int, default=60, help="Tokens per fake Ollama response")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds to wait for each step")
+    args = parser.parse_args()
+
+    server = start_fake_ollama(args.latency_ms / 1000, args.tokens_per_second, args.completion_tokens)
+    try:
+        report = {
+            'settings': {
+                'latency_ms': args.latency_ms,
+                'tokens_per_second': args.tokens_per_second,
+                'completion_tokens': args.completion_tokens
+            },
+            'warmup': run_mode(True, server.url, args.port, args.timeout),
+            'no_warmup': run_mode(False, server.url, args.port, args.timeout)
+        }
+    finally:
+        server.shutdown()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
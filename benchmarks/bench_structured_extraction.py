@@ -0,0 +1,58 @@
+"""Compare the per-question and structured summary extraction paths.
+
+Runs ResumeAnalysisPipeline on a PDF in both modes against a live Ollama
+server and prints latency and token usage for each as JSON.
+
+    python benchmarks/bench_structured_extraction.py Resume_Yash_Borkar.pdf --runs 3
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resume_pipeline import ResumeAnalysisPipeline, ANALYSIS_MODES
+
+
+def run_mode(pdf_path, mode, runs):
+    """Analyse the PDF runs times in one mode and summarise latency and tokens"""
+    latencies, prompt_tokens, completion_tokens, calls = [], [], [], []
+
+    # Warm the embedding cache so both modes measure only retrieval and generation
+    ResumeAnalysisPipeline(pdf_path).load()
+
+    for _ in range(runs):
+        pipeline = ResumeAnalysisPipeline(pdf_path)
+        started = time.time()
+        pipeline.analyze(mode=mode)
+        latencies.append(time.time() - started)
+        prompt_tokens.append(sum(entry['prompt_tokens'] for entry in pipeline.usage))
+        completion_tokens.append(sum(entry['completion_tokens'] for entry in pipeline.usage))
+        calls.append(len(pipeline.usage))
+
+    return {
+        'mode': mode,
+        'runs': runs,
+        'latency_mean_s': statistics.mean(latencies),
+        'latency_max_s': max(latencies),
+        'llm_calls_mean': statistics.mean(calls),
+        'prompt_tokens_mean': statistics.mean(prompt_tokens),
+        'completion_tokens_mean': statistics.mean(completion_tokens)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark structured vs per-question resume extraction")
+    parser.add_argument("pdf_path", help="Path to the resume PDF")
+    parser.add_argument("--runs", type=int, default=3, help="Analyses per mode")
+    args = parser.parse_args()
+
+    results = [run_mode(args.pdf_path, mode, args.runs) for mode in ANALYSIS_MODES]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
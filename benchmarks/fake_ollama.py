@@ -0,0 +1,202 @@
+"""Local stand-in for the Ollama HTTP API with predictable timing.
+
+Serves /api/generate and /api/chat, streamed (NDJSON) or not. Every
+response waits latency seconds before its first token and then produces
+tokens at tokens_per_second, and reports prompt_eval_count, eval_count and
+durations like Ollama does. Requests with format=json get a JSON object
+with the resume summary fields so structured extraction succeeds.
+
+With prefill_tokens_per_second set, prompt evaluation also takes time per
+prompt token, and a prompt cache like Ollama's is simulated: each model
+remembers its last cache_slots prompts, and the longest prefix a new prompt
+shares with one of them is neither evaluated nor counted in
+prompt_eval_count.
+
+    python benchmarks/fake_ollama.py --port 11435 --latency-ms 200 --tokens-per-second 40
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIELDS = ['skills', 'experience', 'education', 'projects', 'summary']
+FILLER = "The candidate has relevant experience with Python Flask and machine learning projects".split()
+
+
+def _text(tokens):
+    return ' '.join(FILLER[i % len(FILLER)] for i in range(tokens))
+
+
+def _json_answer(tokens):
+    per_field = max(1, tokens // len(FIELDS))
+    return json.dumps({field: _text(per_field) for field in FIELDS})
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, body, status=200):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._send_json({'models': []})
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length) or b'{}')
+        if self.path == '/api/generate':
+            prompt = request.get('prompt', '')
+        elif self.path == '/api/chat':
+            prompt = ' '.join(message.get('content', '') for message in request.get('messages', []))
+        else:
+            self._send_json({'error': 'not found'}, 404)
+            return
+
+        server = self.server
+        server.record(len(prompt))
+        started = time.time()
+        prompt_tokens = max(1, server.prefill(request.get('model', ''), prompt) // 4)
+        tokens = server.completion_tokens
+        if request.get('format') == 'json':
+            pieces = [_json_answer(tokens)]
+        else:
+            pieces = [word + ' ' for word in _text(tokens).split()]
+
+        time.sleep(server.latency + (prompt_tokens / server.prefill_tokens_per_second if server.prefill_tokens_per_second else 0))
+        prompt_done = time.time()
+
+        def final(content):
+            body = {
+                'model': request.get('model', ''),
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'done': True,
+                'total_duration': int((time.time() - started) * 1e9),
+                'load_duration': 0,
+                'prompt_eval_count': prompt_tokens,
+                'prompt_eval_duration': int((prompt_done - started) * 1e9),
+                'eval_count': tokens,
+                'eval_duration': int((time.time() - prompt_done) * 1e9)
+            }
+            body.update(self._content(content))
+            return body
+
+        if not request.get('stream', True):
+            time.sleep(tokens / server.tokens_per_second)
+            self._send_json(final(''.join(pieces)))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        delay = tokens / server.tokens_per_second / len(pieces)
+        for piece in pieces:
+            time.sleep(delay)
+            chunk = {'model': request.get('model', ''), 'done': False}
+            chunk.update(self._content(piece))
+            self._write_chunk(chunk)
+        self._write_chunk(final(''))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _content(self, text):
+        if self.path == '/api/chat':
+            return {'message': {'role': 'assistant', 'content': text}}
+        return {'response': text}
+
+    def _write_chunk(self, body):
+        data = json.dumps(body).encode('utf-8') + b'\n'
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.2, tokens_per_second=40.0, completion_tokens=60,
+                 prefill_tokens_per_second=0, cache_slots=1):
+        super().__init__(address, FakeOllamaHandler)
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.cache_slots = max(1, cache_slots)
+        self.requests = 0
+        self.prompt_chars = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def record(self, prompt_chars):
+        with self._lock:
+            self.requests += 1
+            self.prompt_chars += prompt_chars
+
+    def prefill(self, model, prompt):
+        """Characters of prompt to evaluate after the simulated prompt cache; the prompt replaces its best slot"""
+        if not self.prefill_tokens_per_second:
+            return len(prompt)
+        with self._lock:
+            slots = self._cache.setdefault(model, [])
+            shared = [len(os.path.commonprefix([cached, prompt])) for cached in slots]
+            best = max(range(len(slots)), key=shared.__getitem__) if slots else None
+            cached = shared[best] if best is not None else 0
+            if best is not None and (cached or len(slots) >= self.cache_slots):
+                slots.pop(best)
+            elif len(slots) >= self.cache_slots:
+                slots.pop(0)
+            slots.append(prompt)
+        return len(prompt) - cached
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+def start_fake_ollama(latency=0.2, tokens_per_second=40.0, completion_tokens=60, host='127.0.0.1', port=0,
+                      prefill_tokens_per_second=0, cache_slots=1):
+    """Start a fake Ollama server in a background thread; port 0 picks a free port"""
+    server = FakeOllamaServer(
+        (host, port), latency, tokens_per_second, completion_tokens, prefill_tokens_per_second, cache_slots
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Delay before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=40)
+    parser.add_argument("--completion-tokens", type=int, default=60, help="Tokens generated per response")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=0, help="Prompt evaluation speed (0: not simulated)")
+    parser.add_argument("--cache-slots", type=int, default=1, help="Cached prompts per model")
+    args = parser.parse_args()
+
+    server = FakeOllamaServer(
+        (args.host, args.port), args.latency_ms / 1000, args.tokens_per_second, args.completion_tokens,
+        args.prefill_tokens_per_second, args.cache_slots
+    )
+    print(f"Fake Ollama listening on {server.url}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
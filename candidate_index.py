@@ -0,0 +1,354 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from matching import normalize_rows, chunk_vectors
+
+# Corpus index configuration, overridable through the environment
+CANDIDATE_INDEX_DIR = os.environ.get('CANDIDATE_INDEX_DIR', 'candidate_index')
+# Chunks kept in the exact, in-memory delta segment before it is merged into the IVF base segment
+CANDIDATE_INDEX_DELTA_MAX = int(os.environ.get('CANDIDATE_INDEX_DELTA_MAX', 4096))
+# IVF lists probed per query; higher is more accurate and slower
+CANDIDATE_INDEX_NPROBE = int(os.environ.get('CANDIDATE_INDEX_NPROBE', 8))
+# Retrain the IVF quantizer once the corpus needs this many times the base's lists (about sqrt(n),
+# so 2 is roughly 4x the vectors it was trained on); merges in between only add vectors
+CANDIDATE_INDEX_RETRAIN_FACTOR = float(os.environ.get('CANDIDATE_INDEX_RETRAIN_FACTOR', 2))
+
+BASE_FILE = 'base.faiss'
+DELTA_FILE = 'delta.faiss'
+METADATA_FILE = 'metadata.db'
+
+
+def _write_index_atomic(index, path):
+    import faiss
+
+    tmp_path = f"{path}.tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+class CandidateIndex:
+    """Append-only vector index over the chunks of every processed resume.
+
+    Vectors live in two segments: an IVF base segment that is memory-mapped
+    from disk on load, and a small exact delta segment that takes new
+    inserts. Deleting a candidate marks it in SQLite and removes its delta
+    vectors; base vectors of deleted candidates are filtered at query time
+    until the next merge. Once the delta holds CANDIDATE_INDEX_DELTA_MAX
+    chunks it is added to the trained base segment (see merge()); the base
+    is only retrained when the corpus has outgrown it.
+
+    SQLite is the source of truth, so several server processes can share
+    one index directory: each reloads the base segment when its file
+    changes and rebuilds its delta from SQLite when another process has
+    added or removed delta chunks.
+    """
+
+    def __init__(self, index_dir=CANDIDATE_INDEX_DIR, delta_max=CANDIDATE_INDEX_DELTA_MAX,
+                 nprobe=CANDIDATE_INDEX_NPROBE):
+        self.index_dir = index_dir
+        self.delta_max = delta_max
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._merging = False
+        os.makedirs(self.index_dir, exist_ok=True)
+
+        self._db = sqlite3.connect(os.path.join(self.index_dir, METADATA_FILE), timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS candidates (
+                candidate_id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                added_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                candidate_id TEXT NOT NULL,
+                page INTEGER,
+                text TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                in_base INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS chunks_candidate ON chunks (candidate_id)")
+
+        import faiss
+
+        self.base = None
+        self.delta = None
+        base_path = os.path.join(self.index_dir, BASE_FILE)
+        delta_path = os.path.join(self.index_dir, DELTA_FILE)
+        if os.path.exists(base_path):
+            # Inverted lists stay on disk and are paged in on demand
+            self.base = faiss.read_index(base_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            self.base.nprobe = self.nprobe
+        if os.path.exists(delta_path):
+            self.delta = faiss.read_index(delta_path)
+        self._base_mtime = self._file_mtime(BASE_FILE)
+        self._delta_state = self._stored_delta_state()
+
+    def _file_mtime(self, name):
+        try:
+            return os.path.getmtime(os.path.join(self.index_dir, name))
+        except OSError:
+            return None
+
+    def _stored_delta_state(self):
+        """Count and highest ID of the delta chunks in SQLite; changes whenever any process edits the delta"""
+        return tuple(self._db.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM chunks WHERE in_base = 0").fetchone())
+
+    def _sync(self):
+        """Pick up merges, inserts and deletions made by other processes; call with the lock held"""
+        import faiss
+
+        base_mtime = self._file_mtime(BASE_FILE)
+        if base_mtime != self._base_mtime:
+            self.base = faiss.read_index(os.path.join(self.index_dir, BASE_FILE), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            self.base.nprobe = self.nprobe
+            self._base_mtime = base_mtime
+
+        state = self._stored_delta_state()
+        if state != self._delta_state:
+            rows = self._db.execute("SELECT id, vector FROM chunks WHERE in_base = 0 AND candidate_id != ''").fetchall()
+            self.delta = None
+            if rows:
+                vectors = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+                self.delta = self._new_delta(vectors.shape[1])
+                self.delta.add_with_ids(vectors, np.asarray([row[0] for row in rows], dtype=np.int64))
+            self._delta_state = state
+
+    def _new_delta(self, dim):
+        import faiss
+
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+    def contains(self, candidate_id):
+        with self._lock:
+            row = self._db.execute("SELECT deleted FROM candidates WHERE candidate_id = ?", (candidate_id,)).fetchone()
+        return row is not None and not row[0]
+
+    def add(self, candidate_id, name, texts, vectors, pages=None, metadata=None):
+        """Add a candidate's chunks; re-adding a candidate replaces its previous chunks"""
+        if not texts:
+            return
+        vectors = normalize_rows(vectors)
+        pages = pages or [None] * len(texts)
+
+        with self._lock:
+            self._sync()
+            if self._db.execute("SELECT 1 FROM candidates WHERE candidate_id = ?", (candidate_id,)).fetchone():
+                self._purge(candidate_id)
+
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT INTO candidates (candidate_id, name, metadata, added_at) VALUES (?, ?, ?, ?)",
+                (candidate_id, name, json.dumps(metadata or {}), time.time())
+            )
+            ids = []
+            for text, vector, page in zip(texts, vectors, pages):
+                cursor = self._db.execute(
+                    "INSERT INTO chunks (candidate_id, page, text, vector) VALUES (?, ?, ?, ?)",
+                    (candidate_id, page, text, vector.tobytes())
+                )
+                ids.append(cursor.lastrowid)
+            self._db.execute("COMMIT")
+
+            if self.delta is None:
+                self.delta = self._new_delta(vectors.shape[1])
+            self.delta.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+            _write_index_atomic(self.delta, os.path.join(self.index_dir, DELTA_FILE))
+            self._delta_state = self._stored_delta_state()
+            full = self.delta.ntotal >= self.delta_max
+
+        # After releasing the lock, which merge() only takes briefly
+        if full:
+            self.merge()
+
+    def add_vector_store(self, candidate_id, name, vector, metadata=None):
+        """Add every chunk of a per-resume FAISS vector store"""
+        texts, pages = [], []
+        for i in range(len(vector.index_to_docstore_id)):
+            doc = vector.docstore.search(vector.index_to_docstore_id[i])
+            texts.append(doc.page_content)
+            pages.append(doc.metadata.get('page'))
+        self.add(candidate_id, name, texts, chunk_vectors(vector), pages, metadata)
+
+    def _purge(self, candidate_id):
+        """Remove a candidate's rows and delta vectors; base vectors are dropped at the next merge"""
+        ids = [row[0] for row in self._db.execute(
+            "SELECT id FROM chunks WHERE candidate_id = ? AND in_base = 0", (candidate_id,)
+        )]
+        if ids and self.delta is not None:
+            self.delta.remove_ids(np.asarray(ids, dtype=np.int64))
+            _write_index_atomic(self.delta, os.path.join(self.index_dir, DELTA_FILE))
+        self._db.execute("DELETE FROM chunks WHERE candidate_id = ? AND in_base = 0", (candidate_id,))
+        self._db.execute("UPDATE chunks SET candidate_id = '' WHERE candidate_id = ?", (candidate_id,))
+        self._db.execute("DELETE FROM candidates WHERE candidate_id = ?", (candidate_id,))
+
+    def delete(self, candidate_id):
+        """Remove a candidate from search results; returns False if it was not indexed"""
+        with self._lock:
+            self._sync()
+            if not self._db.execute("SELECT 1 FROM candidates WHERE candidate_id = ?", (candidate_id,)).fetchone():
+                return False
+            self._db.execute("BEGIN")
+            self._purge(candidate_id)
+            self._db.execute("COMMIT")
+            self._delta_state = self._stored_delta_state()
+            return True
+
+    def _nlist(self, count):
+        # Roughly sqrt(n) lists, each with enough points to train its centroid
+        return max(1, min(int(np.sqrt(count)), count // 39))
+
+    def merge(self, retrain=False):
+        """Fold the delta segment and deletions into the IVF base segment.
+
+        Delta vectors are added to a writable copy of the trained base and
+        deleted candidates' vectors removed from it; the copy then replaces
+        the base. The quantizer is only retrained (a full rebuild) when
+        there is no base yet, when retrain is set, or once the corpus needs
+        CANDIDATE_INDEX_RETRAIN_FACTOR times the base's lists. The FAISS
+        work runs without the lock, so searches and adds carry on meanwhile.
+        """
+        import faiss
+
+        with self._lock:
+            if self._merging:
+                return
+            self._sync()
+            max_id = self._db.execute("SELECT COALESCE(MAX(id), 0) FROM chunks").fetchone()[0]
+            total = self._db.execute(
+                "SELECT COUNT(*) FROM chunks WHERE candidate_id != '' AND id <= ?", (max_id,)
+            ).fetchone()[0]
+            if not total:
+                return
+            rebuild = (
+                retrain or self.base is None
+                or self._nlist(total) >= CANDIDATE_INDEX_RETRAIN_FACTOR * self.base.nlist
+            )
+            # A full rebuild reads every live chunk; an incremental merge only the delta's
+            rows = self._db.execute(
+                "SELECT id, vector FROM chunks WHERE candidate_id != '' AND id <= ?"
+                + ("" if rebuild else " AND in_base = 0"),
+                (max_id,)
+            ).fetchall()
+            removed = [row[0] for row in self._db.execute(
+                "SELECT id FROM chunks WHERE candidate_id = '' AND in_base = 1 AND id <= ?", (max_id,)
+            )]
+            self._merging = True
+
+        try:
+            ids = np.asarray([row[0] for row in rows], dtype=np.int64)
+            vectors = np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows]) if rows else None
+            base_path = os.path.join(self.index_dir, BASE_FILE)
+            if rebuild:
+                dim = vectors.shape[1]
+                base = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, self._nlist(total), faiss.METRIC_INNER_PRODUCT)
+                base.train(vectors)
+            else:
+                # In-memory copy of the memory-mapped, read-only base
+                base = faiss.read_index(base_path)
+                if removed:
+                    base.remove_ids(np.asarray(removed, dtype=np.int64))
+            if vectors is not None:
+                base.add_with_ids(vectors, ids)
+
+            with self._lock:
+                # Candidates deleted while merging lost their delta rows; drop their vectors too
+                present = {row[0] for row in self._db.execute(
+                    "SELECT id FROM chunks WHERE candidate_id != '' AND id <= ?", (max_id,)
+                )}
+                vanished = [chunk_id for chunk_id in ids.tolist() if chunk_id not in present]
+                if vanished:
+                    base.remove_ids(np.asarray(vanished, dtype=np.int64))
+
+                _write_index_atomic(base, base_path)
+                self.base = faiss.read_index(base_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+                self.base.nprobe = self.nprobe
+                self._base_mtime = self._file_mtime(BASE_FILE)
+
+                self._db.execute("BEGIN")
+                if rebuild:
+                    self._db.execute("DELETE FROM chunks WHERE candidate_id = '' AND id <= ?", (max_id,))
+                else:
+                    self._db.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in removed])
+                # Chunks added while merging stay in the delta
+                self._db.execute("UPDATE chunks SET in_base = 1 WHERE id <= ? AND in_base = 0", (max_id,))
+                self._db.execute("COMMIT")
+
+                if self.delta is not None:
+                    self.delta.remove_ids(faiss.IDSelectorRange(0, max_id + 1))
+                    _write_index_atomic(self.delta, os.path.join(self.index_dir, DELTA_FILE))
+                self._delta_state = self._stored_delta_state()
+        finally:
+            with self._lock:
+                self._merging = False
+
+    def search(self, query_vector, top_candidates=10, chunks_per_candidate=4):
+        """Return the best-matching candidates for a query embedding.
+
+        Each result has the candidate's best chunk score, the matching
+        snippet and page, and the metadata stored when it was added.
+        """
+        query = normalize_rows([query_vector])
+        fetch = top_candidates * chunks_per_candidate
+
+        with self._lock:
+            self._sync()
+            hits = []
+            for segment in (self.base, self.delta):
+                if segment is None or segment.ntotal == 0:
+                    continue
+                scores, ids = segment.search(query, min(fetch, segment.ntotal))
+                hits.extend((float(score), int(chunk_id)) for score, chunk_id in zip(scores[0], ids[0]) if chunk_id >= 0)
+
+            if not hits:
+                return []
+
+            hits.sort(reverse=True)
+            placeholders = ','.join('?' * len(hits))
+            rows = self._db.execute(
+                f"""SELECT chunks.id, chunks.candidate_id, chunks.page, chunks.text, candidates.name, candidates.metadata
+                    FROM chunks JOIN candidates ON candidates.candidate_id = chunks.candidate_id
+                    WHERE chunks.id IN ({placeholders})""",
+                [chunk_id for _, chunk_id in hits]
+            ).fetchall()
+
+        chunks = {row[0]: row for row in rows}
+        results = {}
+        for score, chunk_id in hits:
+            row = chunks.get(chunk_id)
+            # Chunks of deleted candidates have no candidates row
+            if row is None or row[1] in results:
+                continue
+            results[row[1]] = {
+                'candidate_id': row[1],
+                'name': row[4],
+                'score': round(score, 4),
+                'page': row[2],
+                'snippet': row[3],
+                'metadata': json.loads(row[5])
+            }
+            if len(results) >= top_candidates:
+                break
+        return list(results.values())
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_candidate_index():
+    """Return the process-wide candidate index, loading it on first use"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = CandidateIndex()
+    return _index
@@ -0,0 +1,134 @@
+"""Rank many resumes against one job description.
+
+Every resume is parsed and embedded in parallel and pre-ranked by embedding
+similarity to the job description's requirement lines; only the top-K then
+get the full analysis used by /upload (LLM summary, embedding match score).
+Results are produced as a stream of events so callers can show progress:
+
+    {"event": "scored", "candidate": ..., "prerank_score": ...}   one per resume
+    {"event": "error", "candidate": ..., "message": ...}          per resume that failed to score
+    {"event": "preranked", "ranking": [...]}                      once all are scored
+    {"event": "analyzed", "candidate": ..., "summary": {...}}     one per top-K resume
+    {"event": "done", "ranking": [...]}                           final ranking
+
+Command line:
+
+    python candidate_ranking.py --job-description jd.txt --top-k 10 resumes/*.pdf
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from candidate_index import get_candidate_index
+from embedding_store import hash_source
+from matching import embed_requirements, prerank_score
+from rag import load_or_create_embeddings
+from resume_pipeline import ResumeAnalysisPipeline
+
+# Resumes parsed and embedded at the same time
+RANKING_WORKERS = int(os.environ.get('RANKING_WORKERS', 4))
+# Top-K resumes analysed with the LLM at the same time
+RANKING_LLM_WORKERS = int(os.environ.get('RANKING_LLM_WORKERS', 2))
+RANKING_TOP_K = int(os.environ.get('RANKING_TOP_K', 5))
+
+
+def _score_resume(candidate, pdf_path, requirement_matrix):
+    content_hash = hash_source(pdf_path)
+    vector = load_or_create_embeddings(pdf_path, content_hash, name=candidate)
+    if not get_candidate_index().contains(content_hash):
+        get_candidate_index().add_vector_store(content_hash, candidate, vector)
+    return {
+        'candidate': candidate,
+        'pdf_path': pdf_path,
+        'content_hash': content_hash,
+        'vector': vector,
+        'prerank_score': round(prerank_score(requirement_matrix, vector), 1)
+    }
+
+
+def _analyze_resume(entry, job_description):
+    pipeline = ResumeAnalysisPipeline(entry['pdf_path'], entry['content_hash'], vector=entry['vector'], name=entry['candidate'])
+    return pipeline.analyze(job_description, explain_match=True)
+
+
+def _public(entry):
+    """Ranking entry without the in-memory index and file path"""
+    return {key: value for key, value in entry.items() if key not in ('vector', 'pdf_path', 'content_hash')}
+
+
+def rank_candidates(resumes, job_description, top_k=RANKING_TOP_K,
+                    workers=RANKING_WORKERS, llm_workers=RANKING_LLM_WORKERS):
+    """Yield ranking events for resumes, a dict of {candidate name: pdf path or PDF bytes}"""
+    _, requirement_matrix = embed_requirements(job_description)
+
+    # Stage 1: parse, embed and pre-rank every resume in parallel
+    scored = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {
+            pool.submit(_score_resume, candidate, pdf_path, requirement_matrix): candidate
+            for candidate, pdf_path in resumes.items()
+        }
+        for future in as_completed(futures):
+            try:
+                entry = future.result()
+            except Exception as e:
+                yield {'event': 'error', 'candidate': futures[future], 'message': str(e)}
+                continue
+            scored.append(entry)
+            yield {'event': 'scored', 'candidate': entry['candidate'], 'prerank_score': entry['prerank_score']}
+
+    scored.sort(key=lambda entry: entry['prerank_score'], reverse=True)
+    for rank, entry in enumerate(scored, 1):
+        entry['rank'] = rank
+    yield {'event': 'preranked', 'ranking': [_public(entry) for entry in scored]}
+
+    # Stage 2: full analysis for the top-K only (LLM summary, embedding match score); they are reordered by that score
+    shortlist = scored[:max(0, top_k)]
+    if shortlist:
+        with ThreadPoolExecutor(max_workers=max(1, llm_workers)) as pool:
+            futures = {pool.submit(_analyze_resume, entry, job_description): entry for entry in shortlist}
+            for future in as_completed(futures):
+                entry = futures[future]
+                try:
+                    entry['summary'] = future.result()
+                    entry['match_score'] = entry['summary'].get('job_match', {}).get('score', 0)
+                except Exception as e:
+                    entry['error'] = str(e)
+                    entry['match_score'] = 0
+                yield {
+                    'event': 'analyzed',
+                    'candidate': entry['candidate'],
+                    'rank': entry['rank'],
+                    'match_score': entry['match_score'],
+                    'summary': entry.get('summary'),
+                    'error': entry.get('error')
+                }
+
+    # Shortlisted resumes are ordered by their embedding match score, the rest keep their pre-rank order
+    shortlist.sort(key=lambda entry: (entry['match_score'], entry['prerank_score']), reverse=True)
+    final = shortlist + scored[len(shortlist):]
+    for rank, entry in enumerate(final, 1):
+        entry['rank'] = rank
+    yield {
+        'event': 'done',
+        'ranking': [{key: value for key, value in _public(entry).items() if key != 'summary'} for entry in final]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank resumes against a job description")
+    parser.add_argument("pdf_paths", nargs="+", help="Resume PDF files")
+    parser.add_argument("-j", "--job-description", required=True, help="Path to a text file with the job description")
+    parser.add_argument("-k", "--top-k", type=int, default=RANKING_TOP_K, help="Resumes to analyse with the LLM")
+    args = parser.parse_args()
+
+    with open(args.job_description, 'r', encoding='utf-8') as f:
+        job_description = f.read()
+
+    resumes = {os.path.basename(path): path for path in args.pdf_paths}
+    for event in rank_candidates(resumes, job_description, top_k=args.top_k):
+        print(json.dumps(event), flush=True)
+
+
+if __name__ == "__main__":
+    main()
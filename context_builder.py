@@ -0,0 +1,110 @@
+"""Token-budgeted LLM context from retrieved passages.
+
+Neighbouring chunks share up to CHUNK_OVERLAP characters, and the same
+chunk is often retrieved for several questions. build_context drops the
+repeated text, fills a token budget with the passages that carry the most
+relevance per token, and renders them in document order.
+"""
+import math
+import os
+from metrics import CONTEXT_TOKENS
+from tokens import count_tokens
+from tracing import log_event
+
+# Tokens of retrieved context per question; the prompt template and question come on top
+CONTEXT_TOKEN_BUDGET = int(os.environ.get('CONTEXT_TOKEN_BUDGET', 600))
+# Chunks retrieved per question as candidates for the budget
+CONTEXT_FETCH_K = int(os.environ.get('CONTEXT_FETCH_K', 6))
+# Shared text shorter than this many characters is not treated as overlap
+MIN_OVERLAP_CHARS = 20
+
+
+def relevance(distance):
+    """Turn a FAISS L2 distance between normalized embeddings into a 0-1 relevance, like LangChain's FAISS"""
+    return max(0.0, 1.0 - distance / math.sqrt(2))
+
+
+def _overlap(head, tail):
+    """Length of the longest suffix of head that is a prefix of tail"""
+    if len(tail) < MIN_OVERLAP_CHARS:
+        return 0
+    probe = tail[:MIN_OVERLAP_CHARS]
+    start = head.find(probe, max(0, len(head) - len(tail)))
+    while start != -1:
+        if tail.startswith(head[start:]):
+            return len(head) - start
+        start = head.find(probe, start + 1)
+    return 0
+
+
+def _trim(text, selected):
+    """Remove the parts of text already covered by the selected passages"""
+    for other in selected:
+        if text in other:
+            return ''
+        text = text[_overlap(other, text):]
+        cut = _overlap(text, other)
+        if cut:
+            text = text[:-cut]
+    return text.strip()
+
+
+def _position(doc):
+    return doc.metadata.get('page', 0), doc.metadata.get('start_index', 0)
+
+
+def _render(passages):
+    """Passages in page order, with a header whenever the page changes"""
+    parts, page = [], None
+    for doc, text in sorted(passages, key=lambda passage: _position(passage[0])):
+        if doc.metadata.get('page') != page:
+            page = doc.metadata.get('page')
+            parts.append(f"[Page {page}]" if page is not None else "[Document]")
+        parts.append(text)
+    return "\n\n".join(parts)
+
+
+def build_context(scored_docs, budget=CONTEXT_TOKEN_BUDGET, baseline=None):
+    """Return (context text, documents used) for [(document, relevance)] within budget tokens.
+
+    Passages are taken greedily by relevance per token after removing text
+    they share with passages already taken. The most relevant passage is
+    always used, cut to the budget if it does not fit alone. baseline is the
+    context the untrimmed pipeline would have sent; when given, its token
+    count is recorded next to this one's.
+    """
+    candidates = []
+    for doc, score in scored_docs:
+        tokens = count_tokens(doc.page_content)
+        if tokens:
+            candidates.append((score / tokens, score, doc))
+    if not candidates:
+        return '', []
+
+    candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+    best = max(candidates, key=lambda candidate: candidate[1])
+    candidates.remove(best)
+
+    best_text = best[2].page_content.strip()
+    best_tokens = count_tokens(best_text)
+    if best_tokens > budget:
+        best_text = best_text[:len(best_text) * budget // best_tokens]
+        best_tokens = budget
+    selected, used_tokens = [(best[2], best_text)], best_tokens
+    for _, _, doc in candidates:
+        text = _trim(doc.page_content, [chosen for _, chosen in selected])
+        if not text:
+            continue
+        tokens = count_tokens(text)
+        if used_tokens + tokens <= budget:
+            selected.append((doc, text))
+            used_tokens += tokens
+
+    context = _render(selected)
+    after = count_tokens(context)
+    CONTEXT_TOKENS.labels('budgeted').observe(after)
+    if baseline is not None:
+        before = count_tokens(baseline)
+        CONTEXT_TOKENS.labels('baseline').observe(before)
+        log_event('context', tokens_before=before, tokens_after=after, passages=len(selected))
+    return context, [doc for doc, _ in selected]
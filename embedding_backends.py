@@ -0,0 +1,113 @@
+import os
+import threading
+from langchain_core.embeddings import Embeddings
+
+# Runtime for sentence-transformer models: 'torch' (PyTorch) or 'onnx' (ONNX Runtime)
+EMBEDDING_BACKEND = os.environ.get('EMBEDDING_BACKEND', 'torch')
+# Dynamic int8 quantization of the ONNX model; ignored by the torch backend
+EMBEDDING_QUANTIZE = os.environ.get('EMBEDDING_QUANTIZE', '').strip().lower() in ('1', 'true', 'yes', 'on')
+# Instruction set the quantized kernels target: avx2, avx512, avx512_vnni or arm64
+EMBEDDING_QUANTIZATION_CONFIG = os.environ.get('EMBEDDING_QUANTIZATION_CONFIG', 'avx2')
+# Intra-op threads per model; 0 leaves the runtime default (all cores)
+EMBEDDING_THREADS = int(os.environ.get('EMBEDDING_THREADS', 0))
+# Exported and quantized ONNX models are written here once and reused
+ONNX_MODEL_DIR = os.environ.get('ONNX_MODEL_DIR', 'onnx_models')
+
+BACKENDS = ('torch', 'onnx')
+
+_export_lock = threading.Lock()
+
+
+def backend_settings(backend=None, quantize=None):
+    """The settings that change a model's vectors, for embedding cache keys"""
+    backend = backend or EMBEDDING_BACKEND
+    quantize = EMBEDDING_QUANTIZE if quantize is None else quantize
+    if backend == 'onnx' and quantize:
+        return {'backend': 'onnx', 'quantization': f"qint8_{EMBEDDING_QUANTIZATION_CONFIG}"}
+    return {'backend': backend}
+
+
+def onnx_model(model_name, quantize=False):
+    """Export model_name to ONNX (and quantize it) under ONNX_MODEL_DIR on first use.
+
+    Returns (local model directory, ONNX file name within it).
+    """
+    from sentence_transformers import SentenceTransformer
+
+    local_dir = os.path.join(ONNX_MODEL_DIR, model_name.replace('/', '__'))
+    file_name = os.path.join('onnx', 'model.onnx')
+    quantized_name = os.path.join('onnx', f"model_qint8_{EMBEDDING_QUANTIZATION_CONFIG}.onnx")
+
+    with _export_lock:
+        if not os.path.exists(os.path.join(local_dir, file_name)):
+            # Uses the hub's ONNX file when there is one, otherwise exports the PyTorch weights
+            SentenceTransformer(model_name, backend='onnx').save_pretrained(local_dir)
+
+        if quantize and not os.path.exists(os.path.join(local_dir, quantized_name)):
+            from sentence_transformers.backend import export_dynamic_quantized_onnx_model
+            export_dynamic_quantized_onnx_model(
+                SentenceTransformer(local_dir, backend='onnx'),
+                EMBEDDING_QUANTIZATION_CONFIG,
+                local_dir,
+                file_suffix=f"qint8_{EMBEDDING_QUANTIZATION_CONFIG}"
+            )
+
+    return local_dir, quantized_name if quantize else file_name
+
+
+class BackendEmbeddings(Embeddings):
+    """HuggingFaceEmbeddings for one model on the torch or ONNX Runtime backend.
+
+    Both backends run the same sentence-transformers pipeline (tokenizer,
+    pooling, normalisation), so vectors differ only by numerical precision.
+    Pickles as its settings and reloads the model on unpickling, since ONNX
+    Runtime sessions cannot be pickled.
+    """
+
+    def __init__(self, model_name, backend=None, quantize=None, threads=None, batch_size=32):
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        self.model_name = model_name
+        self.backend = backend or EMBEDDING_BACKEND
+        self.quantize = EMBEDDING_QUANTIZE if quantize is None else quantize
+        self.threads = EMBEDDING_THREADS if threads is None else threads
+        self.batch_size = batch_size
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown embedding backend {self.backend!r}, expected one of {BACKENDS}")
+
+        if self.backend == 'onnx':
+            import onnxruntime
+
+            session_options = onnxruntime.SessionOptions()
+            if self.threads:
+                session_options.intra_op_num_threads = self.threads
+                session_options.inter_op_num_threads = 1
+            path, file_name = onnx_model(model_name, self.quantize)
+            model_kwargs = {
+                'backend': 'onnx',
+                'model_kwargs': {
+                    'file_name': file_name,
+                    'provider': 'CPUExecutionProvider',
+                    'session_options': session_options
+                }
+            }
+        else:
+            if self.threads:
+                import torch
+                torch.set_num_threads(self.threads)
+            path, model_kwargs = model_name, {}
+
+        self.client = HuggingFaceEmbeddings(
+            model_name=path,
+            model_kwargs=model_kwargs,
+            encode_kwargs={'batch_size': batch_size}
+        )
+
+    def __reduce__(self):
+        return (BackendEmbeddings, (self.model_name, self.backend, self.quantize, self.threads, self.batch_size))
+
+    def embed_documents(self, texts):
+        return self.client.embed_documents(texts)
+
+    def embed_query(self, text):
+        return self.client.embed_query(text)
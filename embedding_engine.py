@@ -0,0 +1,143 @@
+import os
+import queue
+import threading
+import time
+from langchain_core.embeddings import Embeddings
+from embedding_backends import BackendEmbeddings
+from metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_QUEUE_WAIT
+
+# Embedding configuration, overridable through the environment
+EMBEDDING_MODEL_NAME = os.environ.get('EMBEDDING_MODEL', 'sentence-transformers/paraphrase-MiniLM-L3-v2')
+EMBEDDING_MAX_BATCH_SIZE = int(os.environ.get('EMBEDDING_MAX_BATCH_SIZE', 64))
+EMBEDDING_MAX_WAIT_MS = float(os.environ.get('EMBEDDING_MAX_WAIT_MS', 10))
+
+
+class _EmbeddingRequest:
+    """A list of texts waiting to be encoded by the batching worker"""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.enqueued_at = time.time()
+        self.vectors = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class EmbeddingEngine(Embeddings):
+    """Shared embedding model that encodes concurrent requests in micro-batches.
+
+    Callers block in embed_documents/embed_query while a single worker thread
+    collects pending requests for up to max_wait_ms (or until max_batch_size
+    texts are queued) and encodes them with one model call.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+                 max_wait_ms=EMBEDDING_MAX_WAIT_MS):
+        self.model_name = model_name
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def model(self):
+        """Load the underlying model on first use"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    # torch or ONNX Runtime, as selected by EMBEDDING_BACKEND; both are imported here, not with the app
+                    self._model = BackendEmbeddings(self.model_name, batch_size=self.max_batch_size)
+        return self._model
+
+    def __reduce__(self):
+        # Pickled vector stores refer back to the process-wide engine instead of copying it
+        return (get_embedding_engine, ())
+
+    def embed_documents(self, texts):
+        """Embed a list of texts, sharing a batch with other concurrent callers"""
+        texts = list(texts)
+        if not texts:
+            return []
+
+        self._ensure_worker()
+        embedding_request = _EmbeddingRequest(texts)
+        self._queue.put(embedding_request)
+        embedding_request.done.wait()
+
+        if embedding_request.error is not None:
+            raise embedding_request.error
+        return embedding_request.vectors
+
+    def embed_query(self, text):
+        """Embed a single query text"""
+        return self.embed_documents([text])[0]
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='embedding-batcher', daemon=True)
+                self._worker.start()
+
+    def _collect_batch(self):
+        """Block for the first request, then gather more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.time() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                embedding_request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(embedding_request)
+            size += len(embedding_request.texts)
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.time()
+            for embedding_request in batch:
+                EMBEDDING_QUEUE_WAIT.observe(started - embedding_request.enqueued_at)
+
+            texts = [text for embedding_request in batch for text in embedding_request.texts]
+            EMBEDDING_BATCH_SIZE.observe(len(texts))
+
+            try:
+                vectors = self.model.embed_documents(texts)
+            except Exception as e:
+                for embedding_request in batch:
+                    embedding_request.error = e
+                    embedding_request.done.set()
+                continue
+
+            # Hand each caller back its own slice of the batch
+            offset = 0
+            for embedding_request in batch:
+                count = len(embedding_request.texts)
+                embedding_request.vectors = vectors[offset:offset + count]
+                offset += count
+                embedding_request.done.set()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_embedding_engine():
+    """Return the process-wide embedding engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = EmbeddingEngine()
+    return _engine
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+# Cache location and disk budget, overridable through the environment
+EMBEDDING_CACHE_DIR = os.environ.get('EMBEDDING_CACHE_DIR', 'embedding_cache')
+EMBEDDING_CACHE_MAX_BYTES = int(os.environ.get('EMBEDDING_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+INDEX_FILE = 'index.faiss'
+DOCSTORE_FILE = 'docstore.json'
+DATA_FILE = 'data.json'
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_source(source):
+    """hash_file for a path, or the SHA-256 of in-memory PDF bytes"""
+    if isinstance(source, (bytes, bytearray)):
+        return hashlib.sha256(source).hexdigest()
+    return hash_file(source)
+
+
+def cache_key(content_hash, settings):
+    """Combine a document hash with the chunking/embedding settings that produced its vectors"""
+    payload = json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(f"{content_hash}:{payload}".encode('utf-8')).hexdigest()
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class EmbeddingStore:
+    """Content-addressed FAISS index cache with least-recently-used eviction.
+
+    Each entry is a directory holding the raw FAISS index and a JSON docstore
+    with the chunk text and metadata (or, for save_json, a single JSON value
+    such as extracted page text). Entries are written to a temporary
+    directory and renamed into place, and the directory mtime records the
+    last access for eviction.
+    """
+
+    def __init__(self, cache_dir=EMBEDDING_CACHE_DIR, max_bytes=EMBEDDING_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def contains(self, key):
+        return os.path.exists(os.path.join(self._entry_path(key), INDEX_FILE))
+
+    def load(self, key, embeddings):
+        """Return the cached FAISS store for key, or None on a miss"""
+        import faiss
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.documents import Document
+
+        entry = self._entry_path(key)
+        try:
+            index = faiss.read_index(os.path.join(entry, INDEX_FILE))
+            with open(os.path.join(entry, DOCSTORE_FILE), 'r', encoding='utf-8') as f:
+                records = json.load(f)
+        except (OSError, RuntimeError, ValueError):
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+        docstore = InMemoryDocstore({
+            record['id']: Document(page_content=record['page_content'], metadata=record['metadata'])
+            for record in records
+        })
+        index_to_docstore_id = {i: record['id'] for i, record in enumerate(records)}
+        return FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id
+        )
+
+    def save(self, key, vector):
+        """Persist a FAISS store under key and evict old entries if over budget"""
+        import faiss
+
+        records = []
+        for i in range(len(vector.index_to_docstore_id)):
+            doc_id = vector.index_to_docstore_id[i]
+            doc = vector.docstore.search(doc_id)
+            records.append({'id': doc_id, 'page_content': doc.page_content, 'metadata': doc.metadata})
+
+        entry = self._entry_path(key)
+        tmp_entry = f"{entry}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(tmp_entry)
+        try:
+            faiss.write_index(vector.index, os.path.join(tmp_entry, INDEX_FILE))
+            with open(os.path.join(tmp_entry, DOCSTORE_FILE), 'w', encoding='utf-8') as f:
+                json.dump(records, f)
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # Another worker stored the same key first
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        self.evict()
+
+    def load_json(self, key):
+        """Return a JSON entry stored with save_json, or None on a miss"""
+        entry = self._entry_path(key)
+        try:
+            with open(os.path.join(entry, DATA_FILE), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+        return data
+
+    def save_json(self, key, data):
+        """Persist a JSON-serialisable value under key; it shares the LRU disk budget"""
+        entry = self._entry_path(key)
+        tmp_entry = f"{entry}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(tmp_entry)
+        try:
+            with open(os.path.join(tmp_entry, DATA_FILE), 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.rename(tmp_entry, entry)
+        except OSError:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+
+        self.evict()
+
+    def evict(self):
+        """Delete least-recently-used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if '.tmp-' in name or not os.path.isdir(path):
+                    continue
+                try:
+                    entries.append((os.path.getmtime(path), _dir_size(path), path))
+                except OSError:
+                    continue
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_embedding_store():
+    """Return the process-wide embedding store, creating it on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = EmbeddingStore()
+    return _store
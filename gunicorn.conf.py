@@ -0,0 +1,57 @@
+"""Production serving mode: gunicorn -c gunicorn.conf.py app:app
+
+The master process imports the pipeline libraries and loads the embedding
+model before forking, so every worker shares the model weights
+copy-on-write instead of loading its own copy. The app itself is imported
+in each worker after the fork, giving every worker its own job queue
+threads, SQLite connections and Ollama client. Workers write their metrics
+to PROMETHEUS_MULTIPROC_DIR and /metrics aggregates all of them.
+
+    WEB_WORKERS   worker processes (default: CPU count)
+    WEB_THREADS   request threads per worker (default: 4)
+    WEB_TIMEOUT   seconds before a silent worker is restarted (default: 120)
+    PORT          listen port (default: 5001)
+"""
+import multiprocessing
+import os
+import shutil
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+workers = int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))
+# Server-sent event streams stay open while jobs run
+keepalive = 5
+
+# Must be set before prometheus_client is imported anywhere
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/resume_analyzer_metrics')
+# Split the cores between workers so their torch thread pools do not oversubscribe the CPU
+os.environ.setdefault('OMP_NUM_THREADS', str(max(1, multiprocessing.cpu_count() // max(1, workers))))
+# Load the embedding model in the master; set to 0 to load it in each worker instead
+PRELOAD_EMBEDDING_MODEL = os.environ.get('PRELOAD_EMBEDDING_MODEL', '1').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def on_starting(server):
+    # Metric files of a previous run would be summed with the new workers'
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+    # Requeue jobs interrupted by the last shutdown once, before any worker claims jobs
+    from job_queue import requeue_interrupted
+    requeue_interrupted(os.environ.get('JOB_DB_PATH', 'jobs.db'))
+    os.environ['JOB_RECOVER_ON_START'] = '0'
+
+    if PRELOAD_EMBEDDING_MODEL:
+        import rag
+        from embedding_engine import get_embedding_engine
+        rag.preload()
+        # Weights only: running inference here would start thread pools that do not survive fork
+        get_embedding_engine().model
+        server.log.info("Preloaded embedding model %s", get_embedding_engine().model_name)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
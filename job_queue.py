@@ -0,0 +1,209 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+# Job states; 'success' and 'error' are terminal
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCESS = 'success'
+ERROR = 'error'
+
+
+class QueueFull(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+def requeue_interrupted(db_path):
+    """Put jobs left running by a stopped process back in the queue.
+
+    With several server processes sharing one database this must run once,
+    before any of them starts workers, or a restarting process would requeue
+    jobs that another one is still running.
+    """
+    db = sqlite3.connect(db_path, timeout=10, isolation_level=None)
+    try:
+        db.execute("UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?", (QUEUED, RUNNING))
+    except sqlite3.OperationalError:
+        # No jobs table yet: nothing was interrupted
+        pass
+    finally:
+        db.close()
+
+
+class JobQueue:
+    """Persistent job queue backed by SQLite and drained by a bounded worker pool.
+
+    handler(job, report_progress) runs each job; report_progress(key, value)
+    stores partial results that pollers can read before the job finishes,
+    and the handler's return value becomes the job result. Jobs that were
+    queued or running when the process stopped are picked up again on start.
+
+    Several processes may share one database: jobs are claimed atomically,
+    and idle workers re-check the table every poll_interval seconds for
+    jobs submitted by other processes. Finished jobs are deleted retention
+    seconds after they finish, on start and whenever a job finishes; None
+    keeps them forever.
+    """
+
+    def __init__(self, handler, db_path, workers=2, max_pending=100,
+                 depth_gauge=None, wait_histogram=None, run_histogram=None, poll_interval=1.0, retention=None):
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.depth_gauge = depth_gauge
+        self.wait_histogram = wait_histogram
+        self.run_histogram = run_histogram
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._threads = []
+
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                progress TEXT NOT NULL DEFAULT '{}',
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    def start(self, recover=True):
+        """Start the worker threads, first requeueing interrupted jobs unless recover is False"""
+        if recover:
+            requeue_interrupted(self.db_path)
+        self.purge_expired()
+        with self._lock:
+            self._update_depth()
+            self._changed.notify_all()
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, payload):
+        """Queue a job and return its ID; raises QueueFull at capacity"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            pending = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs already queued")
+
+            self._db.execute(
+                "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(payload), time.time())
+            )
+            self._update_depth()
+            self._changed.notify_all()
+        return job_id
+
+    def get(self, job_id):
+        """Return the job as a dict, or None if it does not exist"""
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def purge_expired(self):
+        """Delete finished jobs older than the retention period; returns how many were deleted"""
+        if not self.retention or self.retention <= 0:
+            return 0
+        with self._lock:
+            return self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (SUCCESS, ERROR, time.time() - self.retention)
+            ).rowcount
+
+    def wait_for_change(self, timeout):
+        """Block until any job is updated in this process, or at most poll_interval for other processes"""
+        if self.poll_interval:
+            timeout = min(timeout, self.poll_interval)
+        with self._changed:
+            self._changed.wait(timeout)
+
+    def _to_dict(self, row):
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'payload': json.loads(row['payload']),
+            'progress': json.loads(row['progress']),
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at']
+        }
+
+    def _update_depth(self):
+        if self.depth_gauge is not None:
+            pending = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+            self.depth_gauge.set(pending)
+
+    def _claim(self):
+        """Wait for the oldest queued job and mark it running"""
+        with self._changed:
+            while True:
+                row = self._db.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    started_at = time.time()
+                    # Another process may have claimed the same job since the SELECT
+                    claimed = self._db.execute(
+                        "UPDATE jobs SET status = ?, started_at = ? WHERE id = ? AND status = ?",
+                        (RUNNING, started_at, row['id'], QUEUED)
+                    ).rowcount
+                    if claimed:
+                        break
+                    continue
+                self._changed.wait(self.poll_interval)
+
+            self._update_depth()
+            self._changed.notify_all()
+
+        if self.wait_histogram is not None:
+            self.wait_histogram.observe(started_at - row['created_at'])
+        job = self._to_dict(row)
+        job['status'] = RUNNING
+        job['started_at'] = started_at
+        return job
+
+    def _report_progress(self, job_id, key, value):
+        with self._changed:
+            row = self._db.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            progress = json.loads(row['progress'])
+            progress[key] = value
+            self._db.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+            self._changed.notify_all()
+
+    def _finish(self, job, status, result=None, error=None):
+        finished_at = time.time()
+        with self._changed:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, finished_at, job['id'])
+            )
+            self._changed.notify_all()
+        if self.run_histogram is not None:
+            self.run_histogram.observe(finished_at - job['started_at'])
+
+    def _run(self):
+        while True:
+            job = self._claim()
+            try:
+                result = self.handler(job, lambda key, value: self._report_progress(job['id'], key, value))
+                self._finish(job, SUCCESS, result=result)
+            except Exception as e:
+                self._finish(job, ERROR, error=str(e))
+            self.purge_expired()
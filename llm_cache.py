@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from metrics import LLM_CACHE_HITS, LLM_CACHE_MISSES, LLM_CACHE_EVICTIONS
+
+# Response cache configuration, overridable through the environment
+LLM_CACHE_BACKEND = os.environ.get('LLM_CACHE_BACKEND', 'memory')  # memory, disk or off
+LLM_CACHE_TTL_SECONDS = float(os.environ.get('LLM_CACHE_TTL_SECONDS', 24 * 60 * 60))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 1000))
+LLM_CACHE_MAX_BYTES = int(os.environ.get('LLM_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+LLM_CACHE_PATH = os.environ.get('LLM_CACHE_PATH', 'llm_cache.db')
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so indentation and blank-line differences share an entry"""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def cache_key(model, prompt, options=None):
+    """Hash of the model, normalized prompt and generation options"""
+    payload = json.dumps([model, normalize_prompt(prompt), options or {}], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU store bounded by entry count and total response size"""
+
+    name = 'memory'
+
+    def __init__(self, max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, size = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        size = len(value.encode('utf-8'))
+        evicted = 0
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (value, time.time() + ttl, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                evicted += 1
+        return evicted
+
+
+class DiskBackend:
+    """SQLite store shared by every worker process on the host"""
+
+    name = 'disk'
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        db = self._db()
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def _db(self):
+        # One connection per thread; SQLite serialises writers across processes
+        if getattr(self._local, 'db', None) is None:
+            self._local.db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            self._local.db.execute("PRAGMA journal_mode=WAL")
+        return self._local.db
+
+    def get(self, key):
+        db = self._db()
+        now = time.time()
+        row = db.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+        db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key, value, ttl):
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode('utf-8')), now + ttl, now)
+            )
+            evicted = db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,)).rowcount
+            count, total = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            # Drop least-recently-used rows until both limits hold
+            for old_key, size in db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                db.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                count -= 1
+                total -= size
+                evicted += 1
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return evicted
+
+
+class ResponseCache:
+    """TTL cache of LLM responses keyed by model, normalized prompt and options"""
+
+    def __init__(self, backend, ttl=LLM_CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get(self, model, prompt, request_type, options=None):
+        """Return the cached response text, or None on a miss"""
+        value = self.backend.get(cache_key(model, prompt, options))
+        if value is None:
+            LLM_CACHE_MISSES.labels(request_type).inc()
+        else:
+            LLM_CACHE_HITS.labels(request_type).inc()
+        return value
+
+    def get_first(self, models, prompt, request_type, options=None):
+        """Return the cached response of the first of models that has one, or None; counted as one lookup"""
+        for model in models:
+            value = self.backend.get(cache_key(model, prompt, options))
+            if value is not None:
+                LLM_CACHE_HITS.labels(request_type).inc()
+                return value
+        LLM_CACHE_MISSES.labels(request_type).inc()
+        return None
+
+    def set(self, model, prompt, value, options=None):
+        evicted = self.backend.set(cache_key(model, prompt, options), value, self.ttl)
+        if evicted:
+            LLM_CACHE_EVICTIONS.labels(self.backend.name).inc(evicted)
+
+
+class NullCache:
+    """Stand-in used when caching is disabled"""
+
+    def get(self, model, prompt, request_type, options=None):
+        return None
+
+    def get_first(self, models, prompt, request_type, options=None):
+        return None
+
+    def set(self, model, prompt, value, options=None):
+        pass
+
+
+def create_response_cache():
+    """Build the response cache selected by LLM_CACHE_BACKEND"""
+    if LLM_CACHE_BACKEND == 'off':
+        return NullCache()
+    if LLM_CACHE_BACKEND == 'disk':
+        return ResponseCache(DiskBackend())
+    return ResponseCache(MemoryBackend())
@@ -0,0 +1,357 @@
+import collections
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Optional, Union
+import httpx
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.outputs import Generation, LLMResult
+from ollama import Client
+from metrics import (
+    LLM_QUEUE_WAIT, LLM_QUEUE_DEPTH, LLM_REJECTIONS, LLM_REQUEST_TIME, LLM_TOKENS_PER_SECOND,
+    LLM_TOKEN_USAGE, LLM_PROMPT_EVAL_TIME, LLM_EVAL_TIME
+)
+from tracing import log_event
+from single_flight import SingleFlight
+
+# Configure Ollama client with the host from environment variable
+OLLAMA_HOST = os.environ.get('OLLAMA_HOST')
+
+# Concurrent requests per model; LLM_MODEL_CONCURRENCY overrides single models, e.g. {"llama3.2": 1}
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 2))
+LLM_MODEL_CONCURRENCY = json.loads(os.environ.get('LLM_MODEL_CONCURRENCY', '{}'))
+# How long Ollama keeps a model loaded after a request ("30m", seconds, or -1 for ever); unset uses the server default
+LLM_KEEP_ALIVE = os.environ.get('LLM_KEEP_ALIVE')
+# Requests allowed to wait per model before new ones are rejected
+LLM_MAX_QUEUE = int(os.environ.get('LLM_MAX_QUEUE', 32))
+# Request durations from this many recent seconds make up the rolling latency used for routing
+LLM_LATENCY_WINDOW_SECONDS = float(os.environ.get('LLM_LATENCY_WINDOW_SECONDS', 300))
+# Identical non-streamed requests in flight at the same time are sent to Ollama once and share its response
+LLM_COALESCE = os.environ.get('LLM_COALESCE', '1').strip().lower() in ('1', 'true', 'yes', 'on')
+
+# Request priorities; lower values are served first
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+
+# How long each priority may wait for a slot before giving up
+LLM_QUEUE_TIMEOUTS = {
+    INTERACTIVE: float(os.environ.get('LLM_INTERACTIVE_QUEUE_TIMEOUT_SECONDS', 30)),
+    BULK: float(os.environ.get('LLM_BULK_QUEUE_TIMEOUT_SECONDS', 300))
+}
+
+
+def parse_keep_alive(value):
+    """Ollama takes keep_alive as a number of seconds or a duration string such as '30m'"""
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+class GatewayBusy(Exception):
+    """Raised when a request cannot get a model slot; status_code is the HTTP status to return"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def record_usage(model, request_type, started, response):
+    """Record latency plus Ollama's token counts and durations (ns) from a finished response"""
+    seconds = time.time() - started
+    LLM_REQUEST_TIME.labels(model, request_type).observe(seconds)
+
+    prompt_tokens = response.get('prompt_eval_count') or 0
+    completion_tokens = response.get('eval_count') or 0
+    prompt_eval_seconds = (response.get('prompt_eval_duration') or 0) / 1e9
+    eval_seconds = (response.get('eval_duration') or 0) / 1e9
+    LLM_TOKEN_USAGE.labels(model, request_type, 'prompt').inc(prompt_tokens)
+    LLM_TOKEN_USAGE.labels(model, request_type, 'completion').inc(completion_tokens)
+    if prompt_eval_seconds > 0:
+        LLM_PROMPT_EVAL_TIME.labels(model, request_type).observe(prompt_eval_seconds)
+    if eval_seconds > 0:
+        LLM_EVAL_TIME.labels(model, request_type).observe(eval_seconds)
+        if completion_tokens:
+            LLM_TOKENS_PER_SECOND.labels(model, request_type).observe(completion_tokens / eval_seconds)
+
+    log_event(
+        'llm', model=model, request_type=request_type, seconds=f"{seconds:.3f}",
+        prompt_tokens=prompt_tokens, prompt_eval_s=f"{prompt_eval_seconds:.3f}",
+        completion_tokens=completion_tokens, eval_s=f"{eval_seconds:.3f}"
+    )
+
+
+class _LatencyWindow:
+    """Durations of the requests finished within the last window seconds, for rolling percentiles"""
+
+    def __init__(self, window, max_samples=1000):
+        self.window = window
+        self._samples = collections.deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append((time.time(), seconds))
+
+    def percentile(self, fraction):
+        """Return (the fraction percentile in seconds, sample count); None without samples"""
+        cutoff = time.time() - self.window
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            values = sorted(seconds for _, seconds in self._samples)
+        if not values:
+            return None, 0
+        return values[min(len(values) - 1, int(fraction * len(values)))], len(values)
+
+
+class _ModelSlots:
+    """Concurrency limit for one model with a bounded, priority-ordered wait queue"""
+
+    def __init__(self, model, limit, max_queue):
+        self.model = model
+        self.limit = max(1, int(limit))
+        self.max_queue = max(0, int(max_queue))
+        self.active = 0
+        self._waiters = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, priority, timeout):
+        priority_name = PRIORITY_NAMES.get(priority, str(priority))
+        started = time.time()
+        with self._cond:
+            if self.active < self.limit and not self._waiters:
+                self.active += 1
+                LLM_QUEUE_WAIT.labels(self.model, priority_name).observe(0)
+                return
+
+            if len(self._waiters) >= self.max_queue:
+                LLM_REJECTIONS.labels(self.model, 'queue_full').inc()
+                raise GatewayBusy(f"Too many pending requests for {self.model}", 429)
+
+            waiter = (priority, next(self._order))
+            heapq.heappush(self._waiters, waiter)
+            LLM_QUEUE_DEPTH.labels(self.model).set(len(self._waiters))
+            try:
+                deadline = started + timeout
+                # Only the highest-priority, longest-waiting request may take a free slot
+                while not (self.active < self.limit and self._waiters[0] == waiter):
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        LLM_REJECTIONS.labels(self.model, 'timeout').inc()
+                        raise GatewayBusy(f"Timed out waiting for {self.model}", 503)
+                    self._cond.wait(remaining)
+                heapq.heappop(self._waiters)
+                self.active += 1
+            except GatewayBusy:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                raise
+            finally:
+                LLM_QUEUE_DEPTH.labels(self.model).set(len(self._waiters))
+                self._cond.notify_all()
+
+        LLM_QUEUE_WAIT.labels(self.model, priority_name).observe(time.time() - started)
+
+    @property
+    def queue_depth(self):
+        return len(self._waiters)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+class _SlotStream:
+    """Iterator over a streamed response that holds its model slot until exhausted or closed.
+
+    on_done(chunk) is called with the final chunk, which carries Ollama's
+    token counts and durations.
+    """
+
+    def __init__(self, slots, chunks, on_done=None):
+        self._slots = slots
+        self._chunks = iter(chunks)
+        self._on_done = on_done
+        self._released = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            chunk = next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+        if chunk.get('done') and self._on_done is not None:
+            self._on_done(chunk)
+        return chunk
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._slots.release()
+
+    def __del__(self):
+        self.close()
+
+
+class LLMGateway:
+    """Single entry point to Ollama shared by the web app and the RAG pipeline.
+
+    All calls go through one pooled client and wait for a per-model slot, so
+    bursts queue here (interactive requests first) instead of piling up on
+    the model server. Requests that cannot be queued fail fast with
+    GatewayBusy. A request given a timeout raises httpx.TimeoutException
+    when Ollama does not answer (or, streamed, send the next chunk) in time.
+    The rolling latency and queue depth per model feed model_router.
+    Identical non-streamed requests already in flight are not sent again:
+    callers wait for the first one and share its response.
+    """
+
+    def __init__(self, host=OLLAMA_HOST, max_concurrency=LLM_MAX_CONCURRENCY,
+                 model_concurrency=None, max_queue=LLM_MAX_QUEUE, keep_alive=LLM_KEEP_ALIVE,
+                 coalesce=LLM_COALESCE):
+        self.host = host
+        self.client = Client(host=host)
+        self._timeout_clients = {}
+        self._latency = {}
+        self.keep_alive = parse_keep_alive(keep_alive)
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = model_concurrency if model_concurrency is not None else LLM_MODEL_CONCURRENCY
+        self.max_queue = max_queue
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._flight = SingleFlight('llm') if coalesce else None
+
+    def _slots_for(self, model):
+        with self._lock:
+            if model not in self._slots:
+                limit = self.model_concurrency.get(model, self.max_concurrency)
+                self._slots[model] = _ModelSlots(model, limit, self.max_queue)
+            return self._slots[model]
+
+    def _client_for(self, timeout):
+        """The shared client, or one per timeout since httpx timeouts are set per client"""
+        if timeout is None:
+            return self.client
+        with self._lock:
+            if timeout not in self._timeout_clients:
+                self._timeout_clients[timeout] = Client(host=self.host, timeout=timeout)
+            return self._timeout_clients[timeout]
+
+    def _latency_for(self, model, request_type):
+        with self._lock:
+            if (model, request_type) not in self._latency:
+                self._latency[(model, request_type)] = _LatencyWindow(LLM_LATENCY_WINDOW_SECONDS)
+            return self._latency[(model, request_type)]
+
+    def model_stats(self, model, request_type, fraction=0.95):
+        """Rolling latency percentile (None without recent requests), its sample count and the queue depth"""
+        latency, samples = self._latency_for(model, request_type).percentile(fraction)
+        return {'latency': latency, 'samples': samples, 'queue_depth': self._slots_for(model).queue_depth}
+
+    def _call(self, method_name, model, priority, stream, request_type, timeout, kwargs):
+        if self.keep_alive is not None:
+            kwargs.setdefault('keep_alive', self.keep_alive)
+        if stream or self._flight is None:
+            return self._send(method_name, model, priority, stream, request_type, timeout, kwargs)
+        # Keyed by everything Ollama sees; a waiting caller shares the first caller's slot, timeout and errors
+        payload = json.dumps([method_name, model, kwargs], sort_keys=True, default=str)
+        return self._flight.do(
+            hashlib.sha256(payload.encode('utf-8')).hexdigest(),
+            lambda: self._send(method_name, model, priority, stream, request_type, timeout, kwargs)
+        )
+
+    def _send(self, method_name, model, priority, stream, request_type, timeout, kwargs):
+        method = getattr(self._client_for(timeout), method_name)
+        latency = self._latency_for(model, request_type)
+        slots = self._slots_for(model)
+        slots.acquire(priority, LLM_QUEUE_TIMEOUTS.get(priority, LLM_QUEUE_TIMEOUTS[BULK]))
+        started = time.time()
+
+        def done(response):
+            record_usage(model, request_type, started, response)
+            latency.add(time.time() - started)
+
+        if stream:
+            try:
+                return _SlotStream(slots, method(model=model, stream=True, **kwargs), on_done=done)
+            except Exception:
+                slots.release()
+                raise
+        try:
+            response = method(model=model, stream=False, **kwargs)
+        except httpx.TimeoutException:
+            # A timed-out request took at least this long; it counts towards the rolling latency
+            latency.add(time.time() - started)
+            raise
+        finally:
+            slots.release()
+        done(response)
+        return response
+
+    def chat(self, model, messages, priority=INTERACTIVE, stream=False, request_type='chat', timeout=None, **kwargs):
+        """ollama Client.chat behind the model's concurrency limit; request_type labels its metrics"""
+        return self._call('chat', model, priority, stream, request_type, timeout, dict(messages=messages, **kwargs))
+
+    def generate(self, model, prompt, priority=INTERACTIVE, stream=False, request_type='generate', timeout=None, **kwargs):
+        """ollama Client.generate behind the model's concurrency limit; request_type labels its metrics"""
+        return self._call('generate', model, priority, stream, request_type, timeout, dict(prompt=prompt, **kwargs))
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway():
+    """Return the process-wide LLM gateway, creating it on first use"""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = LLMGateway()
+    return _gateway
+
+
+class GatewayLLM(BaseLLM):
+    """LangChain LLM that sends completions through the shared gateway.
+
+    generation_info carries Ollama's final response fields
+    (prompt_eval_count, eval_count, durations).
+    """
+
+    model: str
+    priority: int = INTERACTIVE
+    request_type: str = 'qa'
+    # Overrides the gateway's LLM_KEEP_ALIVE for this LLM's requests
+    keep_alive: Optional[Union[float, str]] = None
+    # Seconds before a request to Ollama times out; None waits indefinitely
+    timeout: Optional[float] = None
+
+    @property
+    def _llm_type(self):
+        return "ollama-gateway"
+
+    def _generate(self, prompts, stop=None, run_manager=None, **kwargs):
+        options = {'stop': stop} if stop else None
+        extra = {'keep_alive': parse_keep_alive(self.keep_alive)} if self.keep_alive is not None else {}
+        generations = []
+        for prompt in prompts:
+            response = get_llm_gateway().generate(
+                self.model, prompt, priority=self.priority, request_type=self.request_type,
+                timeout=self.timeout, options=options, **extra
+            )
+            info = {key: value for key, value in response.items() if key not in ('response', 'context')}
+            generations.append([Generation(text=response['response'], generation_info=info)])
+        return LLMResult(generations=generations)
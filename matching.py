@@ -0,0 +1,104 @@
+import os
+import re
+import numpy as np
+from embedding_engine import get_embedding_engine
+
+# Requirement lines shorter than this are headings or noise ("Requirements:", "-")
+MIN_REQUIREMENT_LENGTH = 12
+
+# Cosine similarity at or below MATCH_SIMILARITY_FLOOR counts as no coverage of a requirement,
+# at or above MATCH_SIMILARITY_CEILING as full coverage; a requirement is matched from MATCH_SIMILARITY_THRESHOLD
+MATCH_SIMILARITY_FLOOR = float(os.environ.get('MATCH_SIMILARITY_FLOOR', 0.25))
+MATCH_SIMILARITY_CEILING = float(os.environ.get('MATCH_SIMILARITY_CEILING', 0.65))
+MATCH_SIMILARITY_THRESHOLD = float(os.environ.get('MATCH_SIMILARITY_THRESHOLD', 0.45))
+
+# Requirement weights by wording; everything else weighs 1
+REQUIRED_PATTERN = re.compile(r'\b(required|must|mandatory|essential)\b', re.IGNORECASE)
+PREFERRED_PATTERN = re.compile(r'\b(preferred|nice[- ]to[- ]have|bonus|plus|desirable)\b', re.IGNORECASE)
+
+
+def split_requirements(job_description):
+    """Split a job description into individual requirement lines"""
+    requirements = []
+    for line in re.split(r'[\n;•]+', job_description):
+        line = re.sub(r'^\s*(?:[-*•]|\d+[.)])\s*', '', line).strip()
+        if len(line) >= MIN_REQUIREMENT_LENGTH:
+            requirements.append(line)
+    # A one-paragraph description is treated as a single requirement
+    return requirements or [job_description.strip()]
+
+
+def normalize_rows(matrix):
+    """L2-normalise each row so dot products are cosine similarities"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def chunk_vectors(vector):
+    """Return the chunk embeddings stored in a FAISS vector store as a matrix"""
+    return vector.index.reconstruct_n(0, vector.index.ntotal)
+
+
+def embed_requirements(job_description):
+    """Split a job description and embed every requirement in one batch; returns (lines, matrix)"""
+    requirements = split_requirements(job_description)
+    return requirements, normalize_rows(get_embedding_engine().embed_documents(requirements))
+
+
+def similarity_matrix(requirement_matrix, vector):
+    """Cosine similarity of every requirement (rows) against every resume chunk (columns)"""
+    return requirement_matrix @ normalize_rows(chunk_vectors(vector)).T
+
+
+def prerank_score(requirement_matrix, vector):
+    """Mean best-chunk similarity over all requirements, scaled to 0-100"""
+    similarities = similarity_matrix(requirement_matrix, vector)
+    if similarities.size == 0:
+        return 0.0
+    return float(np.clip(similarities.max(axis=1).mean(), 0, 1) * 100)
+
+
+def requirement_weight(requirement):
+    """Weight of a requirement line: 2 for must-haves, 0.5 for nice-to-haves, 1 otherwise"""
+    if REQUIRED_PATTERN.search(requirement):
+        return 2.0
+    if PREFERRED_PATTERN.search(requirement):
+        return 0.5
+    return 1.0
+
+
+def score_match(job_description, vector):
+    """Deterministic 0-100 match score of a resume's vector store against a job description.
+
+    Every requirement line is covered in proportion to its best chunk
+    similarity between the floor and ceiling, and the score is the
+    weighted mean coverage. Requirements at or above the match threshold
+    are returned as matched with their best evidence, the rest as missing.
+    """
+    requirements, requirement_matrix = embed_requirements(job_description)
+    similarities = similarity_matrix(requirement_matrix, vector)
+    if similarities.size == 0:
+        return {'score': 0, 'matched': [], 'missing': requirements}
+
+    best_chunk = similarities.argmax(axis=1)
+    best_similarity = similarities.max(axis=1)
+    span = max(MATCH_SIMILARITY_CEILING - MATCH_SIMILARITY_FLOOR, 1e-6)
+    coverage = np.clip((best_similarity - MATCH_SIMILARITY_FLOOR) / span, 0, 1)
+    weights = np.asarray([requirement_weight(requirement) for requirement in requirements])
+    score = int(round(float((weights * coverage).sum() / weights.sum()) * 100))
+
+    matched, missing = [], []
+    for i, requirement in enumerate(requirements):
+        if best_similarity[i] >= MATCH_SIMILARITY_THRESHOLD:
+            doc = vector.docstore.search(vector.index_to_docstore_id[int(best_chunk[i])])
+            matched.append({
+                'requirement': requirement,
+                'similarity': round(float(best_similarity[i]), 3),
+                'evidence': doc.page_content[:200],
+                'page': doc.metadata.get('page')
+            })
+        else:
+            missing.append(requirement)
+
+    return {'score': score, 'matched': matched, 'missing': missing}
@@ -0,0 +1,52 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Prometheus metrics shared by the RAG modules. They register with the default
+# REGISTRY, so they are served by the /metrics endpoint in app.py. Under
+# gunicorn (see gunicorn.conf.py) every worker writes to PROMETHEUS_MULTIPROC_DIR
+# and gauges are combined across workers by their multiprocess_mode.
+
+# Embedding engine
+EMBEDDING_BATCH_SIZE = Histogram('resume_analyzer_embedding_batch_size', 'Number of texts encoded per embedding micro-batch', buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256])
+EMBEDDING_QUEUE_WAIT = Histogram('resume_analyzer_embedding_queue_wait_seconds', 'Time embedding requests wait before their micro-batch is encoded', buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5])
+
+# LLM response cache
+LLM_CACHE_HITS = Counter('resume_analyzer_llm_cache_hits_total', 'LLM responses served from the response cache', ['request_type'])
+LLM_CACHE_MISSES = Counter('resume_analyzer_llm_cache_misses_total', 'LLM requests not found in the response cache', ['request_type'])
+LLM_CACHE_EVICTIONS = Counter('resume_analyzer_llm_cache_evictions_total', 'Entries evicted from the LLM response cache', ['backend'])
+
+# LLM gateway
+LLM_QUEUE_WAIT = Histogram('resume_analyzer_llm_queue_wait_seconds', 'Time LLM requests wait for a model slot in the gateway', ['model', 'priority'], buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300])
+LLM_QUEUE_DEPTH = Gauge('resume_analyzer_llm_queue_depth', 'LLM requests waiting for a model slot in the gateway', ['model'], multiprocess_mode='livesum')
+LLM_REJECTIONS = Counter('resume_analyzer_llm_rejections_total', 'LLM requests rejected by the gateway', ['model', 'reason'])
+
+# PDF text extraction
+PDF_PAGE_EXTRACTION_TIME = Histogram('resume_analyzer_pdf_page_extraction_seconds', 'Time to extract the text of one PDF page', ['backend'], buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5])
+PDF_EXTRACTION_CACHE = Counter('resume_analyzer_pdf_extraction_cache_total', 'PDF text extraction cache lookups', ['result'])
+
+# Identical work in flight at the same time, done once and shared
+COALESCED_REQUESTS = Counter('resume_analyzer_coalesced_requests_total', 'Requests that waited for an identical in-flight computation and shared its result', ['operation'])
+
+# Structured summaries
+STRUCTURED_FALLBACKS = Counter('resume_analyzer_structured_fallbacks_total', 'Structured summary answers that fell back to per-question calls, by reason (invalid_json, invalid_fields)', ['reason'])
+
+# Uploads
+UPLOADS = Counter('resume_analyzer_uploads_total', 'Uploaded PDFs by where they were buffered', ['storage'])
+
+# LLM calls, recorded by the gateway from Ollama's own token counts and durations
+LLM_REQUEST_TIME = Histogram('resume_analyzer_llm_request_duration_seconds', 'LLM request duration in seconds, excluding gateway queue wait', ['model', 'request_type'])
+LLM_TOKENS_PER_SECOND = Histogram('resume_analyzer_llm_tokens_per_second', 'LLM generation speed reported by Ollama', ['model', 'request_type'], buckets=[1, 2, 5, 10, 20, 30, 50, 75, 100, 200])
+LLM_TOKEN_USAGE = Counter('resume_analyzer_llm_tokens_total', 'Tokens processed by the LLM', ['model', 'operation', 'kind'])
+LLM_PROMPT_EVAL_TIME = Histogram('resume_analyzer_llm_prompt_eval_seconds', 'Time Ollama spent evaluating the prompt (prefill)', ['model', 'request_type'], buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60])
+LLM_ROUTING = Counter('resume_analyzer_llm_routing_total', 'Model routing decisions by task, model and reason (primary, fallback, queue_depth, p95_over_budget, timeout_failed, busy_failed)', ['task', 'model', 'reason'])
+LLM_EVAL_TIME = Histogram('resume_analyzer_llm_eval_seconds', 'Time Ollama spent generating the response', ['model', 'request_type'], buckets=[0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120])
+
+# Resume pipeline stages (cache_lookup, load, split, embed, index, cache_save, retrieve, prompt, llm)
+PIPELINE_STAGE_TIME = Histogram('resume_analyzer_pipeline_stage_seconds', 'Time spent in each stage of the resume pipeline', ['stage'], buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60])
+
+# LLM context assembly: whole small documents ('full_text') or vector search ('retrieval')
+CONTEXT_PATH = Counter('resume_analyzer_context_path_total', 'LLM contexts built, by path', ['path'])
+CONTEXT_TOKENS = Histogram('resume_analyzer_context_tokens', "LLM context size in tokens: 'budgeted' as sent, 'baseline' as plain top-k retrieval would have sent", ['assembly'], buckets=[50, 100, 200, 300, 400, 600, 800, 1000, 1500, 2000, 3000, 4000, 8000])
+CONTEXT_BUILD_TIME = Histogram('resume_analyzer_context_build_seconds', 'Time from document to LLM context, including any index load or build, by path', ['path'], buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30])
+
+# Startup warm-up
+WARMUP_TIME = Gauge('resume_analyzer_warmup_seconds', 'Time the startup warm-up spent on each component', ['component'], multiprocess_mode='max')
@@ -0,0 +1,135 @@
+import collections
+import json
+import os
+import threading
+import httpx
+from llm_gateway import get_llm_gateway, GatewayBusy, INTERACTIVE
+from metrics import LLM_ROUTING
+
+# Ollama models the default routes use, largest first
+LLM_MODEL = 'llama3.2'
+SMALL_LLM_MODEL = 'llama3.2:1b'
+
+# Per task (the request_type of its LLM calls), models to use in order of preference. A model
+# is skipped while its rolling p95 latency for the task is over p95_budget seconds or more
+# than max_queue_depth requests wait for it; timeout (seconds) applies to each request.
+# LLM_ROUTES replaces single tasks with JSON of the same shape.
+DEFAULT_ROUTES = {
+    'qa': [
+        {'model': LLM_MODEL, 'p95_budget': 20, 'timeout': 120},
+        {'model': SMALL_LLM_MODEL, 'p95_budget': 10, 'timeout': 120}
+    ],
+    'resume_analysis': [
+        {'model': LLM_MODEL, 'p95_budget': 60, 'timeout': 300},
+        {'model': SMALL_LLM_MODEL, 'p95_budget': 30, 'timeout': 300}
+    ],
+    'job_generator': [
+        {'model': SMALL_LLM_MODEL, 'p95_budget': 60, 'timeout': 180}
+    ],
+    'interview_questions': [
+        {'model': SMALL_LLM_MODEL, 'p95_budget': 60, 'timeout': 180}
+    ]
+}
+LLM_ROUTES = {**DEFAULT_ROUTES, **json.loads(os.environ.get('LLM_ROUTES', '{}'))}
+# Queue depth at which a model is skipped, unless its route sets max_queue_depth
+LLM_ROUTER_MAX_QUEUE_DEPTH = int(os.environ.get('LLM_ROUTER_MAX_QUEUE_DEPTH', 4))
+# Requests in the latency window before a model's p95 is trusted
+LLM_ROUTER_MIN_SAMPLES = int(os.environ.get('LLM_ROUTER_MIN_SAMPLES', 5))
+
+Route = collections.namedtuple('Route', ['task', 'model', 'timeout', 'tier'])
+
+
+class ModelRouter:
+    """Pick the Ollama model for each task from an ordered list of tiers.
+
+    The first tier whose model is within its latency budget and queue limit
+    wins, using the gateway's rolling latency (the durations also recorded
+    in LLM_REQUEST_TIME) for the task. If every tier is over its limits the
+    last, smallest model is used. chat() also moves to the next tier when a
+    request times out or cannot get a slot. Every decision is counted in
+    LLM_ROUTING with the reason the model was chosen.
+    """
+
+    def __init__(self, routes=None, gateway=None):
+        self.routes = routes if routes is not None else LLM_ROUTES
+        self.gateway = gateway
+
+    def _gateway(self):
+        return self.gateway or get_llm_gateway()
+
+    def tiers(self, task):
+        if task not in self.routes:
+            raise KeyError(f"No model route for task {task!r}")
+        return self.routes[task]
+
+    def models(self):
+        """Every model some route may use, for warm-up"""
+        return list(dict.fromkeys(tier['model'] for tiers in self.routes.values() for tier in tiers))
+
+    def _route(self, task, tier, reason):
+        tiers = self.tiers(task)
+        LLM_ROUTING.labels(task, tiers[tier]['model'], reason).inc()
+        return Route(task, tiers[tier]['model'], tiers[tier].get('timeout'), tier)
+
+    def _skip_reason(self, task, tier):
+        """Why tier should be skipped right now, or None if it is within its limits"""
+        stats = self._gateway().model_stats(tier['model'], task)
+        if stats['queue_depth'] > tier.get('max_queue_depth', LLM_ROUTER_MAX_QUEUE_DEPTH):
+            return 'queue_depth'
+        if stats['samples'] >= LLM_ROUTER_MIN_SAMPLES and stats['latency'] > tier.get('p95_budget', float('inf')):
+            return 'p95_over_budget'
+        return None
+
+    def route(self, task, start=0):
+        """Return the Route for task's next request, considering tiers from start on"""
+        tiers = self.tiers(task)
+        reason = 'primary' if start == 0 else 'fallback'
+        for index in range(start, len(tiers) - 1):
+            skip = self._skip_reason(task, tiers[index])
+            if skip is None:
+                return self._route(task, index, reason)
+            reason = skip
+        return self._route(task, len(tiers) - 1, reason)
+
+    def fallback(self, route, reason):
+        """The next smaller tier after route failed for reason, or None after the last tier"""
+        if route.tier + 1 >= len(self.tiers(route.task)):
+            return None
+        LLM_ROUTING.labels(route.task, route.model, f"{reason}_failed").inc()
+        return self.route(route.task, route.tier + 1)
+
+    def chat(self, task, messages, priority=INTERACTIVE, route=None, **kwargs):
+        """Non-streamed gateway chat on the routed model; returns (model, response).
+
+        A request that times out or cannot get a model slot is retried on
+        the next tier; the last tier's error is raised.
+        """
+        route = route or self.route(task)
+        while True:
+            try:
+                return route.model, self._gateway().chat(
+                    route.model, messages, priority=priority, request_type=task, timeout=route.timeout, **kwargs
+                )
+            except httpx.TimeoutException:
+                next_route = self.fallback(route, 'timeout')
+                if next_route is None:
+                    raise
+            except GatewayBusy:
+                next_route = self.fallback(route, 'busy')
+                if next_route is None:
+                    raise
+            route = next_route
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_model_router():
+    """Return the process-wide model router, creating it on first use"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter()
+    return _router
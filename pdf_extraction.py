@@ -0,0 +1,192 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from embedding_store import get_embedding_store, hash_source, cache_key
+from metrics import PDF_PAGE_EXTRACTION_TIME, PDF_EXTRACTION_CACHE
+from single_flight import SingleFlight
+
+# Extraction backend: 'pdfplumber' (layout-aware, the PDFPlumberLoader default), 'pypdfium2'
+# (fast, text only) or 'auto' (pypdfium2 unless the first page has tables or drawn layout)
+PDF_EXTRACTION_BACKEND = os.environ.get('PDF_EXTRACTION_BACKEND', 'pdfplumber')
+# Documents with at least this many pages are split across a process pool
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', 4))
+PDF_EXTRACTION_WORKERS = int(os.environ.get('PDF_EXTRACTION_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Drawn rectangles/lines on the first page above which 'auto' keeps pdfplumber
+LAYOUT_OBJECT_THRESHOLD = 20
+
+# Every function taking pdf_path also accepts the PDF's bytes, for uploads parsed in memory
+
+
+def _pdfplumber_open(pdf_path):
+    import pdfplumber
+
+    return pdfplumber.open(io.BytesIO(pdf_path) if isinstance(pdf_path, (bytes, bytearray)) else pdf_path)
+
+
+def _pdfplumber_pages(pdf_path, page_numbers):
+    results = []
+    with _pdfplumber_open(pdf_path) as pdf:
+        for page_number in page_numbers:
+            started = time.time()
+            text = pdf.pages[page_number].extract_text() or ''
+            results.append((page_number, text, time.time() - started))
+    return results
+
+
+def _pypdfium2_pages(pdf_path, page_numbers):
+    import pypdfium2
+
+    results = []
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        for page_number in page_numbers:
+            started = time.time()
+            page = pdf[page_number]
+            textpage = page.get_textpage()
+            text = textpage.get_text_range().replace('\r\n', '\n')
+            textpage.close()
+            page.close()
+            results.append((page_number, text, time.time() - started))
+    finally:
+        pdf.close()
+    return results
+
+
+BACKENDS = {
+    'pdfplumber': _pdfplumber_pages,
+    'pypdfium2': _pypdfium2_pages
+}
+
+
+def _extract_pages(backend, pdf_path, page_numbers):
+    """Extract a range of pages; runs in a pool process for large documents"""
+    return BACKENDS[backend](pdf_path, page_numbers)
+
+
+def page_count(pdf_path):
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(pdf_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def choose_backend(pdf_path):
+    """Pick the text-only backend unless the first page looks layout-heavy"""
+    with _pdfplumber_open(pdf_path) as pdf:
+        if not pdf.pages:
+            return 'pypdfium2'
+        first_page = pdf.pages[0]
+        if first_page.find_tables() or len(first_page.rects) + len(first_page.lines) > LAYOUT_OBJECT_THRESHOLD:
+            return 'pdfplumber'
+    return 'pypdfium2'
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _pool_context():
+    """A start method that never forks the multithreaded app process.
+
+    By the time the pool starts, job workers, the embedding batcher and
+    torch's thread pools are running; a forked child could inherit a lock
+    one of them holds and deadlock. forkserver forks children from a clean,
+    single-threaded server that has imported only this module and the PDF
+    libraries, so start-up stays cheap and the web app is never re-imported.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('spawn')
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__, 'pdfplumber', 'pypdfium2'])
+    return context
+
+
+def _get_pool():
+    """Process pool for page extraction, recreated in forked worker processes"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACTION_WORKERS, mp_context=_pool_context())
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def extract_pages(pdf_path, backend):
+    """Return [(page_number, text)] for every page, in parallel for multi-page documents"""
+    total = page_count(pdf_path)
+    pages = list(range(total))
+
+    if total >= PDF_PARALLEL_MIN_PAGES and PDF_EXTRACTION_WORKERS > 1:
+        # Contiguous page ranges so each process opens the document once
+        size = -(-total // min(PDF_EXTRACTION_WORKERS, total))
+        ranges = [pages[i:i + size] for i in range(0, total, size)]
+        pool = _get_pool()
+        results = []
+        for part in pool.map(_extract_pages, [backend] * len(ranges), [pdf_path] * len(ranges), ranges):
+            results.extend(part)
+        results.sort()
+    else:
+        results = _extract_pages(backend, pdf_path, pages)
+
+    for _, _, seconds in results:
+        PDF_PAGE_EXTRACTION_TIME.labels(backend).observe(seconds)
+    return [(page_number, text) for page_number, text, _ in results]
+
+
+def text_cache_key(content_hash, backend=None):
+    """Embedding store key of a document's extracted page text"""
+    return cache_key(content_hash, {'stage': 'text', 'backend': backend or PDF_EXTRACTION_BACKEND})
+
+
+# Concurrent requests for the same uncached PDF share one parse
+_text_flight = SingleFlight('pdf_text')
+
+
+def _extract_and_save(store, key, pdf_path, backend):
+    resolved = choose_backend(pdf_path) if backend == 'auto' else backend
+    pages = extract_pages(pdf_path, resolved)
+    store.save_json(key, pages)
+    return pages
+
+
+def extract_documents(pdf_path, content_hash=None, backend=None, name=None):
+    """Load a PDF as one LangChain Document per page, like PDFPlumberLoader.
+
+    Extracted text is cached by file hash and backend, so re-chunking or
+    re-embedding the same PDF with different settings skips parsing.
+    pdf_path may be a path, the PDF's bytes, or None to use the cached text
+    of content_hash only; name is the document's source in the metadata.
+    Concurrent calls for the same uncached PDF wait for one parse.
+    """
+    from langchain_core.documents import Document
+
+    backend = backend or PDF_EXTRACTION_BACKEND
+    if name is None:
+        name = pdf_path if isinstance(pdf_path, str) else ''
+
+    store = get_embedding_store()
+    key = text_cache_key(content_hash or hash_source(pdf_path), backend)
+    pages = store.load_json(key)
+    if pages is None:
+        PDF_EXTRACTION_CACHE.labels('miss').inc()
+        if pdf_path is None:
+            raise FileNotFoundError(f"The text of document {content_hash} is no longer cached; upload it again")
+        pages = _text_flight.do(key, lambda: _extract_and_save(store, key, pdf_path, backend))
+    else:
+        PDF_EXTRACTION_CACHE.labels('hit').inc()
+
+    return [
+        Document(
+            page_content=text,
+            metadata={'source': name, 'file_path': name, 'page': page_number, 'total_pages': len(pages)}
+        )
+        for page_number, text in pages
+    ]
@@ -1,102 +1,232 @@
+import importlib
 import os
-import pickle
+import time
 import warnings
-from langchain_community.document_loaders import PDFPlumberLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.llms import Ollama
-from langchain.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
-from langchain.chains.llm import LLMChain
-from langchain.chains.combine_documents.stuff import StuffDocumentsChain
-
-def load_or_create_embeddings(pdf_path):
-    """Load existing embeddings or create new ones for a PDF file"""
-    embeddings_path = f"embeddings_{os.path.basename(pdf_path)}.pkl"
-    if os.path.exists(embeddings_path):
-        with open(embeddings_path, 'rb') as f:
-            return pickle.load(f)
-
-    # Create new embeddings
-    loader = PDFPlumberLoader(pdf_path)
-    docs = loader.load()
+from embedding_engine import get_embedding_engine, EMBEDDING_MODEL_NAME
+from embedding_backends import backend_settings
+from embedding_store import get_embedding_store, hash_source, cache_key
+from pdf_extraction import extract_documents
+from llm_gateway import GatewayLLM, INTERACTIVE
+from model_router import get_model_router
+from tracing import stage
+from tokens import count_tokens, get_tokenizer
+from context_builder import build_context, relevance, CONTEXT_TOKEN_BUDGET, CONTEXT_FETCH_K
+from metrics import CONTEXT_PATH, CONTEXT_BUILD_TIME
+from single_flight import SingleFlight
 
-    # Split into chunks
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len
-    )
-    documents = text_splitter.split_documents(docs)
-
-    # Create vector embeddings
-    embedder = HuggingFaceEmbeddings(model_name="sentence-transformers/paraphrase-MiniLM-L3-v2")
-    vector = FAISS.from_documents(documents, embedder)
+# Chunking settings; part of the embedding cache key
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
 
-    with open(embeddings_path, 'wb') as f:
-        pickle.dump(vector, f)
+EMBEDDING_SETTINGS = {
+    'chunk_size': CHUNK_SIZE,
+    'chunk_overlap': CHUNK_OVERLAP,
+    'model': EMBEDDING_MODEL_NAME,
+    **backend_settings()
+}
 
-    return vector
+# Retrieval and generation settings
+RETRIEVAL_K = 3
+# Models come from model_router's 'qa' route
+# Documents whose whole text fits this many tokens skip the vector index and go into the prompt in full; 0 always retrieves
+FULL_TEXT_TOKEN_BUDGET = int(os.environ.get('FULL_TEXT_TOKEN_BUDGET', 1500))
 
-def setup_qa_chain(vector):
-    """Set up the retrieval QA chain"""
-    retriever = vector.as_retriever(search_type="similarity", search_kwargs={"k": 3})
-    llm = Ollama(model="llama3.2")
+# Prompts about a document start with its context and put the task after it, so every
+# call about the same document shares a prefix that Ollama's prompt cache evaluates once
+CONTEXT_PREFIX = """
+    Context: {context}
+"""
 
-    prompt = """
-    Use the following context to answer the question. 
+QA_PROMPT = CONTEXT_PREFIX + """
+    Use the context above to answer the question.
     If you don't know the answer, just say "I don't know" - don't make up an answer.
     Keep your response concise (3-4 sentences).
 
-    Context: {context}
     Question: {question}
 
     Helpful Answer:"""
 
-    llm_chain = LLMChain(llm=llm, prompt=PromptTemplate.from_template(prompt))
+DOCUMENT_PROMPT = "Content: {page_content}\nSource: {source}"
+
+# Imported on first use rather than with this module; see preload()
+HEAVY_MODULES = (
+    'faiss',
+    'langchain_community.vectorstores',
+    'langchain_text_splitters',
+    'langchain.chains',
+    'pdfplumber',
+    'pypdfium2'
+)
+
+def preload():
+    """Import the libraries the pipeline otherwise loads on its first request"""
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+    get_tokenizer()
+
+# Concurrent requests for the same document's index share one load or build
+_embeddings_flight = SingleFlight('embeddings')
+
+def load_or_create_embeddings(pdf_path, content_hash=None, name=None):
+    """Load existing embeddings or create new ones for a PDF.
+
+    pdf_path may also be the PDF's bytes, or None when its text is cached
+    under content_hash; name is the chunks' source.
+    Concurrent calls for the same content wait for one load or build.
+    """
+    content_hash = content_hash or hash_source(pdf_path)
+    key = cache_key(content_hash, EMBEDDING_SETTINGS)
+    return _embeddings_flight.do(key, lambda: _load_or_create_embeddings(pdf_path, content_hash, name, key))
+
+def _load_or_create_embeddings(pdf_path, content_hash, name, key):
+    from langchain_community.vectorstores import FAISS
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    store = get_embedding_store()
+    engine = get_embedding_engine()
+    with stage('cache_lookup'):
+        vector = store.load(key, engine)
+    if vector is not None:
+        return vector
+
+    # Create new embeddings; page text is itself cached by file hash
+    with stage('load'):
+        docs = extract_documents(pdf_path, content_hash, name=name)
+
+    # Split into chunks
+    with stage('split'):
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            length_function=len,
+            add_start_index=True
+        )
+        documents = text_splitter.split_documents(docs)
+
+    # Create vector embeddings with the shared, batching embedding engine
+    with stage('embed'):
+        embeddings = engine.embed_documents([doc.page_content for doc in documents])
+
+    with stage('index'):
+        vector = FAISS.from_embeddings(
+            [(doc.page_content, embedding) for doc, embedding in zip(documents, embeddings)],
+            engine,
+            metadatas=[doc.metadata for doc in documents]
+        )
+
+    with stage('cache_save'):
+        store.save(key, vector)
+
+    return vector
+
+def load_full_text(pdf_path, content_hash=None, name=None):
+    """Return a PDF's page documents if they fit FULL_TEXT_TOKEN_BUDGET, else None.
+
+    Small documents are used as the whole LLM context: chunking, embedding
+    and retrieval would mostly return the same text anyway.
+    """
+    if FULL_TEXT_TOKEN_BUDGET <= 0:
+        return None
+    try:
+        with stage('load'):
+            docs = extract_documents(pdf_path, content_hash, name=name)
+    except FileNotFoundError:
+        # The page text was evicted from the cache, but the vector index may still be there
+        return None
+    if count_tokens("\n\n".join(doc.page_content for doc in docs)) > FULL_TEXT_TOKEN_BUDGET:
+        return None
+    return docs
+
+def record_context_path(path, started):
+    """Count a built LLM context by path and time it from started"""
+    CONTEXT_PATH.labels(path).inc()
+    CONTEXT_BUILD_TIME.labels(path).observe(time.time() - started)
+
+def build_combine_documents_chain(llm):
+    """Build the chain that stuffs retrieved documents into the QA prompt"""
+    from langchain.prompts import PromptTemplate
+    from langchain.chains.llm import LLMChain
+    from langchain.chains.combine_documents.stuff import StuffDocumentsChain
+
+    llm_chain = LLMChain(llm=llm, prompt=PromptTemplate.from_template(QA_PROMPT))
     document_prompt = PromptTemplate(
         input_variables=["page_content", "source"],
-        template="Content: {page_content}\nSource: {source}"
+        template=DOCUMENT_PROMPT
     )
 
-    combine_documents_chain = StuffDocumentsChain(
+    return StuffDocumentsChain(
         llm_chain=llm_chain,
         document_variable_name="context",
         document_prompt=document_prompt
     )
 
+def format_context(docs):
+    """Render documents the same way the stuff chain does for the {context} variable"""
+    from langchain_core.prompts import PromptTemplate, format_document
+
+    document_prompt = PromptTemplate(
+        input_variables=["page_content", "source"],
+        template=DOCUMENT_PROMPT
+    )
+    return "\n\n".join(format_document(doc, document_prompt) for doc in docs)
+
+def setup_qa_chain(vector):
+    """Set up the retrieval QA chain"""
+    from langchain.chains import RetrievalQA
+
+    retriever = vector.as_retriever(search_type="similarity", search_kwargs={"k": RETRIEVAL_K})
+    route = get_model_router().route('qa')
+    llm = GatewayLLM(model=route.model, priority=INTERACTIVE, timeout=route.timeout)
+
     return RetrievalQA(
-        combine_documents_chain=combine_documents_chain,
+        combine_documents_chain=build_combine_documents_chain(llm),
         retriever=retriever,
         return_source_documents=True
     )
 
+def extract_sources(source_documents):
+    """Return the distinct page references of the top two source documents"""
+    sources = []
+    for doc in (source_documents or [])[:2]:
+        if hasattr(doc, 'metadata') and 'page' in doc.metadata:
+            page = doc.metadata.get('page', 'unknown')
+            sources.append(f"Page {page}")
+    return list(set(sources))
+
 def query_pdf(pdf_path, question):
     """Query a PDF with a question and return the answer"""
     warnings.filterwarnings("ignore")
     
     try:
-        # Initialize the embeddings and QA chain
-        vector = load_or_create_embeddings(pdf_path)
-        qa_chain = setup_qa_chain(vector)
-        
-        # Get the answer
-        result = qa_chain(question)
-        answer = result['result']
-        
-        # Extract sources
-        sources = []
-        if result.get('source_documents'):
-            for doc in result['source_documents'][:2]:
-                if hasattr(doc, 'metadata') and 'page' in doc.metadata:
-                    page = doc.metadata.get('page', 'unknown')
-                    sources.append(f"Page {page}")
+        started = time.time()
+        docs = load_full_text(pdf_path)
+        if docs is not None:
+            scored, budget = [(doc, 1.0) for doc in docs], FULL_TEXT_TOKEN_BUDGET
+            record_context_path('full_text', started)
+        else:
+            vector = load_or_create_embeddings(pdf_path)
+
+            # The steps of the RetrievalQA chain from setup_qa_chain, timed one by one, with extra candidates for the budget
+            with stage('retrieve'):
+                scored = [
+                    (doc, relevance(distance))
+                    for doc, distance in vector.similarity_search_with_score(question, k=CONTEXT_FETCH_K)
+                ]
+            budget = CONTEXT_TOKEN_BUDGET
+            record_context_path('retrieval', started)
+        with stage('prompt'):
+            baseline = format_context([doc for doc, _ in scored[:RETRIEVAL_K]] if docs is None else docs)
+            context, docs = build_context(scored, budget, baseline)
+            prompt = QA_PROMPT.format(context=context, question=question)
+        with stage('llm'):
+            route = get_model_router().route('qa')
+            answer = GatewayLLM(model=route.model, priority=INTERACTIVE, timeout=route.timeout).invoke(prompt)
+        result = {'query': question, 'result': answer, 'source_documents': docs}
         
         return {
             "status": "success",
             "answer": answer,
-            "sources": list(set(sources)),
+            "sources": extract_sources(docs),
             "raw_result": result
         }
         
@@ -0,0 +1,441 @@
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from embedding_engine import get_embedding_engine
+from llm_gateway import get_llm_gateway, parse_keep_alive, GatewayLLM, BULK
+from matching import score_match
+from metrics import STRUCTURED_FALLBACKS
+from model_router import get_model_router
+from tracing import stage
+from context_builder import build_context, relevance, CONTEXT_TOKEN_BUDGET, CONTEXT_FETCH_K
+from rag import (
+    load_or_create_embeddings, load_full_text, record_context_path, format_context, extract_sources,
+    CONTEXT_PREFIX, QA_PROMPT, RETRIEVAL_K, FULL_TEXT_TOKEN_BUDGET
+)
+
+# Maximum number of LLM calls one analysis sends at the same time
+ANALYSIS_MAX_CONCURRENCY = int(os.environ.get('ANALYSIS_MAX_CONCURRENCY', 5))
+
+# 'per_question' asks one question per category; 'structured' asks for all categories in one JSON answer
+ANALYSIS_MODES = ('per_question', 'structured')
+ANALYSIS_MODE = os.environ.get('ANALYSIS_MODE', 'per_question')
+
+# Predefined questions to ask about the resume
+SUMMARY_QUESTIONS = {
+    'skills': 'What are the key skills mentioned in this resume?',
+    'experience': 'Summarize the work experience in this resume.',
+    'education': 'What is the educational background in this resume?',
+    'projects': 'What projects are mentioned in this resume?',
+    'summary': 'Provide a concise professional summary of this candidate based on the resume.'
+}
+
+# Ollama keeps the analysis model loaded this long, so later calls for a resume find its prompt cache
+ANALYSIS_KEEP_ALIVE = parse_keep_alive(os.environ.get('ANALYSIS_KEEP_ALIVE', '30m'))
+# Give every question about a resume one shared context, so all its prompts start with the same prefix
+ANALYSIS_SHARED_CONTEXT = os.environ.get('ANALYSIS_SHARED_CONTEXT', '1').strip().lower() in ('1', 'true', 'yes', 'on')
+# Tokens of retrieved context covering all summary questions at once (the shared context and the structured call)
+ANALYSIS_CONTEXT_TOKEN_BUDGET = int(os.environ.get('ANALYSIS_CONTEXT_TOKEN_BUDGET', 1500))
+
+logger = logging.getLogger('resume_analyzer.pipeline')
+
+STRUCTURED_SUMMARY_PROMPT = CONTEXT_PREFIX + """
+    Use the context above from a resume to fill in a JSON object with exactly these string fields:
+    "skills": the key skills mentioned in the resume
+    "experience": a summary of the work experience
+    "education": the educational background
+    "projects": the projects mentioned
+    "summary": a concise professional summary of the candidate
+    If the context does not cover a field, set it to "I don't know" - don't make up an answer.
+    Keep each field concise (3-4 sentences). Respond with the JSON object only.
+
+    JSON:"""
+
+JOB_MATCH_PROMPT = """
+            Compare the following resume summary with the job description:
+
+            Resume Summary:
+            Skills: {skills}
+            Experience: {experience}
+            Education: {education}
+            Projects: {projects}
+
+            Job Description:
+            {job_description}
+
+            Provide:
+            1. A match score from 0-100 indicating how well the candidate matches the job requirements
+            2. A brief analysis of the match, highlighting strengths and gaps
+            3. Recommendations for the candidate to improve their match for this position
+            """
+
+
+def parse_job_match(response_text):
+    """Extract the score, analysis and recommendations from a job-match answer"""
+    match_analysis = {
+        'score': 0,
+        'analysis': '',
+        'recommendations': ''
+    }
+
+    # Try to extract score
+    score_match = re.search(r'(\d{1,3})(?:\s*\/\s*100|\s*\%)', response_text)
+    if score_match:
+        match_analysis['score'] = int(score_match.group(1))
+
+    # Split response into sections
+    sections = response_text.split('\n\n')
+    if len(sections) >= 2:
+        match_analysis['analysis'] = sections[0]
+    if len(sections) >= 3:
+        match_analysis['recommendations'] = sections[1]
+    else:
+        match_analysis['analysis'] = response_text
+
+    return match_analysis
+
+
+def summary_entry(category, result):
+    """Convert a query result into the {'answer', 'sources'} entry of the summary JSON"""
+    if result["status"] == "success":
+        return {
+            'answer': result["answer"],
+            'sources': result.get("sources", [])
+        }
+    return {
+        'answer': f"Error analyzing {category}: {result.get('message', 'Unknown error')}",
+        'sources': []
+    }
+
+
+def validate_structured_summary(data):
+    """Split a structured answer into valid fields and the names of fields that failed.
+
+    Every field of SUMMARY_QUESTIONS must be a non-empty string; a list of
+    strings (common for skills) is accepted and joined with commas.
+    """
+    if not isinstance(data, dict):
+        return {}, list(SUMMARY_QUESTIONS)
+
+    valid, failed = {}, []
+    for field in SUMMARY_QUESTIONS:
+        value = data.get(field)
+        if isinstance(value, list) and all(isinstance(item, str) for item in value):
+            value = ', '.join(item.strip() for item in value if item.strip())
+        if isinstance(value, str) and value.strip():
+            valid[field] = value.strip()
+        else:
+            failed.append(field)
+    return valid, failed
+
+
+class ResumeAnalysisPipeline:
+    """Answer the summary questions for one resume with a single index load.
+
+    A resume that fits rag.FULL_TEXT_TOKEN_BUDGET is given to every question
+    in full. Otherwise its vector index is loaded once, all questions are
+    embedded in one batch for retrieval, and the passages retrieved for all
+    of them form one shared context (or, without shared_context, each
+    question's own context is cut to CONTEXT_TOKEN_BUDGET). Every call goes
+    to the one model routed for the resume ('resume_analysis' in
+    model_router) with the shared context as its prompt prefix, so Ollama
+    evaluates the resume once and reuses it for the following questions.
+    The LLM calls run concurrently up to max_concurrency.
+    """
+
+    def __init__(self, pdf_path, content_hash=None, max_concurrency=ANALYSIS_MAX_CONCURRENCY, vector=None, name=None,
+                 shared_context=ANALYSIS_SHARED_CONTEXT):
+        # pdf_path may be a path, the PDF's bytes, or None for a document whose page text is cached under content_hash
+        self.pdf_path = pdf_path
+        self.content_hash = content_hash
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        # An already loaded vector index may be passed in to skip the cache lookup
+        self.vector = vector
+        # 'full_text' (self.documents is the whole resume) or 'retrieval', decided by load()
+        self.context_path = None
+        self.documents = None
+        # (context text, documents) every question is asked against, built on first use
+        self.shared_context = shared_context
+        self.context = None
+        # The model every call for this resume goes to, routed once by load()
+        self.route = None
+        self.llm = None
+        # One entry per LLM call: evaluated prompt and completion token counts, prefill and wall time
+        self.usage = []
+
+    def load(self):
+        """Load the resume's full text or vector index, and the LLM client"""
+        if self.context_path is None:
+            self.documents = load_full_text(self.pdf_path, self.content_hash, self.name)
+            if self.documents is not None:
+                self.context_path = 'full_text'
+            else:
+                self.context_path = 'retrieval'
+                self.load_vector()
+        if self.llm is None:
+            self.route = get_model_router().route('resume_analysis')
+            # Resume analysis queues behind interactive requests in the gateway
+            self.llm = GatewayLLM(
+                model=self.route.model, priority=BULK, request_type='resume_analysis',
+                keep_alive=ANALYSIS_KEEP_ALIVE, timeout=self.route.timeout
+            )
+
+    def load_vector(self):
+        """Load the resume's vector index, which job matching and the candidate index always need"""
+        if self.vector is None:
+            self.vector = load_or_create_embeddings(self.pdf_path, self.content_hash, self.name)
+        return self.vector
+
+    def _record_usage(self, call, started, info):
+        info = info or {}
+        self.usage.append({
+            'call': call,
+            'prompt_tokens': info.get('prompt_eval_count', 0),
+            'completion_tokens': info.get('eval_count', 0),
+            'prompt_eval_seconds': (info.get('prompt_eval_duration') or 0) / 1e9,
+            'seconds': time.time() - started
+        })
+
+    def retrieve_many(self, questions):
+        """Embed every question in one batched call and retrieve [(document, relevance)] for each.
+
+        On the full-text path every question gets the whole resume instead.
+        """
+        started = time.time()
+        self.load()
+        if self.context_path == 'full_text':
+            retrieved = {key: [(doc, 1.0) for doc in self.documents] for key in questions}
+        else:
+            with stage('retrieve'):
+                question_vectors = get_embedding_engine().embed_documents(list(questions.values()))
+                retrieved = {
+                    key: [
+                        (doc, relevance(distance))
+                        for doc, distance in self.vector.similarity_search_with_score_by_vector(question_vector, k=CONTEXT_FETCH_K)
+                    ]
+                    for key, question_vector in zip(questions, question_vectors)
+                }
+        record_context_path(self.context_path, started)
+        return retrieved
+
+    def _context(self, scored, baseline_docs, budget=CONTEXT_TOKEN_BUDGET):
+        """Return (context text, documents used) for retrieved [(document, relevance)].
+
+        baseline_docs are what plain top-k retrieval would have sent, for the
+        before/after token counts.
+        """
+        if self.context_path == 'full_text':
+            return build_context(scored, FULL_TEXT_TOKEN_BUDGET, format_context(self.documents))
+        return build_context(scored, budget, format_context(baseline_docs))
+
+    def _build_shared_context(self, retrieved):
+        """One context for every question: each retrieved passage once, at its best relevance.
+
+        It covers every category, so it gets ANALYSIS_CONTEXT_TOKEN_BUDGET
+        rather than one question's budget; the baseline is each question's
+        top-k as plain retrieval would send it.
+        """
+        best, baseline_docs = {}, {}
+        for scored in retrieved.values():
+            for rank, (doc, score) in enumerate(scored):
+                if doc.page_content not in best or score > best[doc.page_content][1]:
+                    best[doc.page_content] = (doc, score)
+                if rank < RETRIEVAL_K:
+                    baseline_docs.setdefault(doc.page_content, doc)
+        return self._context(list(best.values()), list(baseline_docs.values()), budget=ANALYSIS_CONTEXT_TOKEN_BUDGET)
+
+    def _answer(self, key, question, scored):
+        try:
+            started = time.time()
+            with stage('prompt'):
+                if self.context is not None:
+                    context, _ = self.context
+                    docs = [doc for doc, _ in scored]
+                else:
+                    context, docs = self._context(scored, [doc for doc, _ in scored[:RETRIEVAL_K]])
+                prompt = QA_PROMPT.format(context=context, question=question)
+            with stage('llm'):
+                generation = self.llm.generate([prompt]).generations[0][0]
+            self._record_usage(key, started, generation.generation_info)
+            return {
+                "status": "success",
+                "answer": generation.text,
+                "sources": extract_sources(docs)
+            }
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+
+    def _answer_many(self, questions, retrieved, on_result=None):
+        def answer(key, question):
+            result = self._answer(key, question, retrieved[key])
+            if on_result is not None:
+                on_result(key, result)
+            return result
+
+        workers = min(self.max_concurrency, len(questions))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Each call runs in a copy of the caller's context so it keeps the trace ID
+            futures = {
+                key: pool.submit(contextvars.copy_context().run, answer, key, question)
+                for key, question in questions.items()
+            }
+            return {key: future.result() for key, future in futures.items()}
+
+    def _fail_all(self, keys, error, on_result=None):
+        results = {key: {"status": "error", "message": str(error)} for key in keys}
+        if on_result is not None:
+            for key, result in results.items():
+                on_result(key, result)
+        return results
+
+    def ask_many(self, questions, on_result=None):
+        """Answer a dict of {key: question} and return {key: result} in the query_pdf format.
+
+        on_result(key, result) is called as soon as each answer is ready.
+        """
+        warnings.filterwarnings("ignore")
+
+        try:
+            if self.context is not None:
+                # Later questions (the job match) reuse the shared context and its cached prefix
+                retrieved = {key: [] for key in questions}
+            else:
+                retrieved = self.retrieve_many(questions)
+                if self.shared_context:
+                    with stage('prompt'):
+                        self.context = self._build_shared_context(retrieved)
+        except Exception as e:
+            return self._fail_all(questions, e, on_result)
+
+        return self._answer_many(questions, retrieved, on_result)
+
+    def extract_structured(self, on_result=None):
+        """Answer all summary questions with one JSON-format LLM call.
+
+        Fields missing from or invalid in the JSON answer are retried with
+        the per-question path; results use the same format as ask_many.
+        Errors from the LLM call itself (connection, timeout, busy gateway)
+        are raised rather than retried question by question.
+        """
+        warnings.filterwarnings("ignore")
+
+        try:
+            retrieved = self.retrieve_many(SUMMARY_QUESTIONS)
+        except Exception as e:
+            return self._fail_all(SUMMARY_QUESTIONS, e, on_result)
+
+        started = time.time()
+        with stage('prompt'):
+            context = self._build_shared_context(retrieved)
+            if self.shared_context:
+                # Retries and the job match then start with the same prefix as this call
+                self.context = context
+            prompt = STRUCTURED_SUMMARY_PROMPT.format(context=context[0])
+        with stage('llm'):
+            response = get_llm_gateway().generate(
+                self.route.model,
+                prompt,
+                priority=BULK,
+                # The router picks the resume's model from the 'resume_analysis' p95, so this call feeds it too
+                request_type='resume_analysis',
+                timeout=self.route.timeout,
+                format='json',
+                keep_alive=ANALYSIS_KEEP_ALIVE
+            )
+        self._record_usage('structured', started, response)
+
+        try:
+            data = json.loads(response['response'])
+        except (ValueError, KeyError, TypeError) as e:
+            data = None
+            STRUCTURED_FALLBACKS.labels('invalid_json').inc()
+            logger.warning("Structured summary was not valid JSON, asking each question instead: %s", e)
+
+        valid, failed = validate_structured_summary(data)
+        if failed and data is not None:
+            STRUCTURED_FALLBACKS.labels('invalid_fields').inc()
+            logger.warning("Structured summary fields %s were missing or invalid, asking them one by one", ', '.join(failed))
+        results = {
+            field: {
+                "status": "success",
+                "answer": answer,
+                "sources": extract_sources([doc for doc, _ in retrieved[field]])
+            }
+            for field, answer in valid.items()
+        }
+        if on_result is not None:
+            for field, result in results.items():
+                on_result(field, result)
+        if failed:
+            retry = {field: SUMMARY_QUESTIONS[field] for field in failed}
+            results.update(self._answer_many(retry, retrieved, on_result))
+
+        return {field: results[field] for field in SUMMARY_QUESTIONS}
+
+    def match_job(self, job_description, summary, explain=False):
+        """Score the resume against a job description.
+
+        The score and the matched/missing requirements come from embedding
+        similarity; the LLM is asked for a narrative analysis and
+        recommendations only when explain is set.
+        """
+        match = score_match(job_description, self.load_vector())
+        match_analysis = {
+            'score': match['score'],
+            'analysis': f"Matches {len(match['matched'])} of {len(match['matched']) + len(match['missing'])} job requirements.",
+            'recommendations': '',
+            'matched_requirements': match['matched'],
+            'missing_requirements': match['missing']
+        }
+        if match['missing']:
+            match_analysis['recommendations'] = 'Show evidence of: ' + '; '.join(match['missing'])
+
+        if explain:
+            job_analysis_prompt = JOB_MATCH_PROMPT.format(
+                skills=summary['skills']['answer'],
+                experience=summary['experience']['answer'],
+                education=summary['education']['answer'],
+                projects=summary['projects']['answer'],
+                job_description=job_description
+            )
+
+            match_result = self.ask_many({'job_match': job_analysis_prompt})['job_match']
+            if match_result["status"] == "success":
+                narrative = parse_job_match(match_result["answer"])
+                match_analysis['analysis'] = narrative['analysis']
+                match_analysis['recommendations'] = narrative['recommendations'] or match_analysis['recommendations']
+
+        return match_analysis
+
+    def analyze(self, job_description='', mode=None, on_progress=None, explain_match=False):
+        """Build the structured summary returned by the /upload endpoint.
+
+        on_progress(category, entry) receives each summary entry as soon as it
+        is ready, before the whole summary is complete.
+        """
+        def report(category, result):
+            if on_progress is not None:
+                on_progress(category, summary_entry(category, result))
+
+        if (mode or ANALYSIS_MODE) == 'structured':
+            results = self.extract_structured(on_result=report)
+        else:
+            results = self.ask_many(SUMMARY_QUESTIONS, on_result=report)
+
+        summary = {category: summary_entry(category, result) for category, result in results.items()}
+
+        # Job description analysis if provided
+        if job_description:
+            summary['job_match'] = self.match_job(job_description, summary, explain=explain_match)
+            if on_progress is not None:
+                on_progress('job_match', summary['job_match'])
+
+        return summary
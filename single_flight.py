@@ -0,0 +1,50 @@
+import threading
+from metrics import COALESCED_REQUESTS
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time within this process.
+
+    Callers that arrive while the computation for their key is in flight
+    wait for it and share its result, or its exception, instead of running
+    it again. Nothing is remembered once it finishes; caching the result is
+    up to the caller. operation labels COALESCED_REQUESTS.
+    """
+
+    def __init__(self, operation):
+        self.operation = operation
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return fn(), or the result of the in-flight fn() already running for key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            COALESCED_REQUESTS.labels(self.operation).inc()
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,87 @@
+import json
+from langchain_core.documents import Document
+from langchain_core.outputs import Generation, LLMResult
+import rag
+import resume_pipeline
+from model_router import Route
+from resume_pipeline import ResumeAnalysisPipeline, SUMMARY_QUESTIONS
+
+PASSAGES = [
+    "Skills: Python, Flask, FAISS and PyTorch for retrieval and model serving.",
+    "Experience: backend engineer at Acme building document search for three years.",
+    "Education: BSc in Computer Science from the University of Mumbai."
+]
+
+
+class FakeVector:
+    def similarity_search_with_score_by_vector(self, vector, k):
+        return [
+            (Document(page_content=text, metadata={'source': 'resume.pdf', 'page': 0, 'start_index': index * 100}), 0.3)
+            for index, text in enumerate(PASSAGES)
+        ][:k]
+
+
+class FakeEngine:
+    def embed_documents(self, texts):
+        return [[0.0] for _ in texts]
+
+
+class FakeRouter:
+    def route(self, task):
+        return Route(task, 'fake-model', None, 0)
+
+
+class FakeLLM:
+    prompts = []
+
+    def __init__(self, **kwargs):
+        pass
+
+    def generate(self, prompts):
+        FakeLLM.prompts.extend(prompts)
+        return LLMResult(generations=[[Generation(text='answer', generation_info={})]])
+
+
+class FakeGateway:
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, model, prompt, **kwargs):
+        self.prompts.append(prompt)
+        return {'response': json.dumps({field: 'answer' for field in SUMMARY_QUESTIONS})}
+
+
+def _pipeline(monkeypatch, gateway=None):
+    # 0 turns the small-resume full-text path off; it must not shrink the retrieved context
+    monkeypatch.setattr(rag, 'FULL_TEXT_TOKEN_BUDGET', 0)
+    monkeypatch.setattr(resume_pipeline, 'FULL_TEXT_TOKEN_BUDGET', 0)
+    monkeypatch.setattr(resume_pipeline, 'get_embedding_engine', FakeEngine)
+    monkeypatch.setattr(resume_pipeline, 'get_model_router', FakeRouter)
+    monkeypatch.setattr(resume_pipeline, 'GatewayLLM', FakeLLM)
+    if gateway is not None:
+        monkeypatch.setattr(resume_pipeline, 'get_llm_gateway', lambda: gateway)
+    FakeLLM.prompts = []
+    return ResumeAnalysisPipeline(None, content_hash='resume', vector=FakeVector(), shared_context=True)
+
+
+def test_shared_context_keeps_resume_text_with_full_text_budget_zero(monkeypatch):
+    pipeline = _pipeline(monkeypatch)
+    results = pipeline.ask_many(SUMMARY_QUESTIONS)
+
+    assert pipeline.context_path == 'retrieval'
+    assert all(result['status'] == 'success' for result in results.values())
+    assert len(FakeLLM.prompts) == len(SUMMARY_QUESTIONS)
+    for prompt in FakeLLM.prompts:
+        for text in PASSAGES:
+            assert text in prompt
+
+
+def test_structured_context_keeps_resume_text_with_full_text_budget_zero(monkeypatch):
+    gateway = FakeGateway()
+    pipeline = _pipeline(monkeypatch, gateway)
+    results = pipeline.extract_structured()
+
+    assert all(result['status'] == 'success' for result in results.values())
+    assert len(gateway.prompts) == 1
+    for text in PASSAGES:
+        assert text in gateway.prompts[0]
@@ -0,0 +1,63 @@
+import logging
+import os
+import threading
+
+# Tokenizer for prompt token counts:
+#   'tiktoken:<encoding>'  tiktoken; cl100k_base shares most of Llama 3's vocabulary
+#   'hf:<model or path>'   a Hugging Face tokenizer, exact for the LLM's own (e.g. hf:meta-llama/Llama-3.2-1B)
+#   'estimate'             CHARS_PER_TOKEN characters per token, no dependency
+LLM_TOKENIZER = os.environ.get('LLM_TOKENIZER', 'tiktoken:cl100k_base')
+
+logger = logging.getLogger('resume_analyzer.tokens')
+
+# Characters per token of the Llama 3 tokenizer on English resume text, for estimates
+CHARS_PER_TOKEN = 4
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def _estimate(text):
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _load_tokenizer(spec):
+    kind, _, name = spec.partition(':')
+    if kind == 'tiktoken':
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(name or 'cl100k_base')
+        # Special-token text in a resume is counted as plain text rather than rejected
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    if kind == 'hf':
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(name)
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+    if kind != 'estimate':
+        logger.warning("Unknown LLM_TOKENIZER %r, estimating token counts", spec)
+    return _estimate
+
+
+def get_tokenizer():
+    """The LLM_TOKENIZER counting function, loaded on first use.
+
+    Falls back to the character estimate, with one warning, when the
+    tokenizer cannot be loaded: e.g. tiktoken is not installed, or its
+    encoding file is neither in TIKTOKEN_CACHE_DIR nor downloadable.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                try:
+                    _tokenizer = _load_tokenizer(LLM_TOKENIZER)
+                except Exception as e:
+                    logger.warning("Failed to load tokenizer %s, estimating token counts: %s", LLM_TOKENIZER, e)
+                    _tokenizer = _estimate
+    return _tokenizer
+
+
+def count_tokens(text):
+    """Number of LLM tokens in text"""
+    return get_tokenizer()(text)
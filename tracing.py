@@ -0,0 +1,73 @@
+import contextlib
+import contextvars
+import logging
+import os
+import re
+import time
+import uuid
+from metrics import PIPELINE_STAGE_TIME
+
+# Log one line per pipeline stage and LLM call, tagged with the request's trace ID
+TRACE_LOGGING = os.environ.get('TRACE_LOGGING', '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+# Client-supplied trace IDs (X-Request-ID) are only accepted in this form
+TRACE_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+logger = logging.getLogger('resume_analyzer.trace')
+if TRACE_LOGGING:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_trace_id = contextvars.ContextVar('trace_id', default=None)
+
+
+def new_trace_id(candidate=None):
+    """Return candidate if it is a well-formed trace ID, otherwise a fresh one"""
+    if candidate and TRACE_ID_PATTERN.match(candidate):
+        return candidate
+    return uuid.uuid4().hex[:16]
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+def start_trace(trace_id=None):
+    """Make trace_id the current trace; returns a token for end_trace"""
+    return _trace_id.set(new_trace_id(trace_id))
+
+
+def end_trace(token):
+    _trace_id.reset(token)
+
+
+@contextlib.contextmanager
+def trace(trace_id=None):
+    """Run a block under a trace ID, e.g. a background job started by a request"""
+    token = start_trace(trace_id)
+    try:
+        yield current_trace_id()
+    finally:
+        end_trace(token)
+
+
+def log_event(event, **fields):
+    """Log an event for the current trace when TRACE_LOGGING is on"""
+    if TRACE_LOGGING:
+        details = ' '.join(f"{key}={value}" for key, value in fields.items())
+        logger.info("trace=%s event=%s %s", current_trace_id() or '-', event, details)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a pipeline stage into PIPELINE_STAGE_TIME and the trace log"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        PIPELINE_STAGE_TIME.labels(name).observe(seconds)
+        log_event('stage', stage=name, seconds=f"{seconds:.4f}")
@@ -0,0 +1,133 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import uuid
+from flask import Request
+from metrics import UPLOADS
+
+# Uploaded files up to this size stay in memory; larger ones spill to a temp file
+UPLOAD_SPOOL_MAX_BYTES = int(os.environ.get('UPLOAD_SPOOL_MAX_BYTES', 8 * 1024 * 1024))
+# Where spilled uploads go; unset uses the system temp directory
+UPLOAD_TEMP_DIR = os.environ.get('UPLOAD_TEMP_DIR') or None
+# Uploads waiting for their analysis job; each file is deleted when its job ends
+JOB_UPLOAD_DIR = os.environ.get('JOB_UPLOAD_DIR', 'job_uploads')
+
+
+class SpooledUpload:
+    """Buffer for one uploaded file that hashes its content as it is streamed in.
+
+    The multipart parser writes the file here chunk by chunk. Content stays
+    in memory up to max_size and then moves to a named temp file, so large
+    PDFs can still be opened by path (and by extraction pool processes).
+    """
+
+    def __init__(self, max_size=UPLOAD_SPOOL_MAX_BYTES, temp_dir=UPLOAD_TEMP_DIR):
+        self.max_size = max_size
+        self.temp_dir = temp_dir
+        self.size = 0
+        self.path = None
+        self._digest = hashlib.sha256()
+        self._file = io.BytesIO()
+
+    @property
+    def content_hash(self):
+        """SHA-256 hex digest of everything written so far"""
+        return self._digest.hexdigest()
+
+    def write(self, data):
+        self._digest.update(data)
+        self.size += len(data)
+        if self.path is None and self.size > self.max_size:
+            self._spill()
+        return self._file.write(data)
+
+    def _spill(self):
+        spilled = tempfile.NamedTemporaryFile(prefix='upload_', suffix='.pdf', dir=self.temp_dir, delete=False)
+        spilled.write(self._file.getvalue())
+        self._file = spilled
+        self.path = spilled.name
+
+    def source(self):
+        """The PDF as bytes when in memory, or the temp file path when spilled"""
+        if self.path is None:
+            return self._file.getvalue()
+        self._file.flush()
+        return self.path
+
+    def save(self, directory=JOB_UPLOAD_DIR):
+        """Write the upload to a new file in directory and return its path.
+
+        The file is complete once the path is returned and is independent of
+        this buffer, which may be discarded afterwards.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.content_hash}-{uuid.uuid4().hex}.pdf")
+        tmp_path = f"{path}.tmp"
+        if self.path is None:
+            with open(tmp_path, 'wb') as f:
+                f.write(self._file.getvalue())
+        else:
+            self._file.flush()
+            shutil.copyfile(self.path, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    def discard(self):
+        """Close the buffer and delete the temp file, if any"""
+        self._file.close()
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        # Werkzeug closes request files when the request ends; the temp file stays until discard()
+        self._file.close()
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+
+class UploadRequest(Request):
+    """Flask request that streams uploaded files into SpooledUpload buffers instead of temp files"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledUpload()
+
+
+def read_upload(file):
+    """Return (source, content hash, SpooledUpload) for an uploaded FileStorage.
+
+    source is bytes, or a temp file path above UPLOAD_SPOOL_MAX_BYTES; call
+    discard() on the returned upload once the source is no longer needed.
+    """
+    upload = file.stream
+    if not isinstance(upload, SpooledUpload):
+        # Parsed by a different request class: hash and buffer it now
+        upload = SpooledUpload()
+        file.stream.seek(0)
+        for block in iter(lambda: file.stream.read(1024 * 1024), b''):
+            upload.write(block)
+    UPLOADS.labels('memory' if upload.path is None else 'temp_file').inc()
+    return upload.source(), upload.content_hash, upload
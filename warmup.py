@@ -0,0 +1,89 @@
+import os
+import threading
+import time
+from metrics import WARMUP_TIME
+
+# Warm up the pipeline in a background thread at startup
+WARMUP_ON_START = os.environ.get('WARMUP_ON_START', '1').strip().lower() in ('1', 'true', 'yes', 'on')
+# Comma-separated Ollama models to load at startup; unset warms the app's default models, empty warms none
+WARMUP_LLM_MODELS = os.environ.get('WARMUP_LLM_MODELS')
+# How long Ollama keeps the warmed models loaded; defaults to LLM_KEEP_ALIVE, or 30 minutes when that is unset
+WARMUP_KEEP_ALIVE = os.environ.get('WARMUP_KEEP_ALIVE') or os.environ.get('LLM_KEEP_ALIVE') or '30m'
+
+PENDING = 'pending'
+READY = 'ready'
+
+
+class WarmUp:
+    """Load the pipeline's libraries and models before the first request needs them.
+
+    Steps run in order in a background thread: heavy imports, the embedding
+    model (with one encode so its weights are paged in), then one empty
+    generate per Ollama model, which loads it and keeps it resident for
+    WARMUP_KEEP_ALIVE. The service is ready once the imports and embedding
+    model are loaded; Ollama models that fail to load are reported but do
+    not block readiness, since they also load on first use.
+    """
+
+    def __init__(self, llm_models=()):
+        self.llm_models = list(llm_models)
+        self.status = {'imports': PENDING, 'embedding_model': PENDING}
+        self.status.update({f"llm:{model}": PENDING for model in self.llm_models})
+        self.seconds = {}
+        self.started_at = None
+        self.finished_at = None
+        self._thread = None
+
+    def start(self):
+        """Run the warm-up in a daemon thread"""
+        self._thread = threading.Thread(target=self.run, name='warm-up', daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        # Imported here so that importing this module stays cheap
+        from embedding_engine import get_embedding_engine
+        from llm_gateway import get_llm_gateway, parse_keep_alive, BULK
+        import rag
+
+        self.started_at = time.time()
+        self._step('imports', rag.preload)
+        self._step('embedding_model', lambda: get_embedding_engine().embed_query("warm up"))
+        keep_alive = parse_keep_alive(WARMUP_KEEP_ALIVE)
+        for model in self.llm_models:
+            # An empty prompt only loads the model into memory
+            self._step(f"llm:{model}", lambda model=model: get_llm_gateway().generate(
+                model, '', priority=BULK, request_type='warmup', keep_alive=keep_alive
+            ))
+        self.finished_at = time.time()
+
+    def _step(self, component, action):
+        started = time.time()
+        try:
+            action()
+            self.status[component] = READY
+        except Exception as e:
+            self.status[component] = f"error: {e}"
+        self.seconds[component] = time.time() - started
+        WARMUP_TIME.labels(component).set(self.seconds[component])
+
+    @property
+    def ready(self):
+        return self.status['imports'] == READY and self.status['embedding_model'] == READY
+
+    @property
+    def finished(self):
+        return self.finished_at is not None
+
+    def report(self):
+        return {
+            'components': dict(self.status),
+            'seconds': {component: round(seconds, 3) for component, seconds in self.seconds.items()}
+        }
+
+
+def warmup_models(default_models):
+    """Models named by WARMUP_LLM_MODELS, or default_models when it is unset"""
+    if WARMUP_LLM_MODELS is None:
+        return list(dict.fromkeys(default_models))
+    return [model.strip() for model in WARMUP_LLM_MODELS.split(',') if model.strip()]